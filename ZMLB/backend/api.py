@@ -1,50 +1,266 @@
-from flask import Flask, request, jsonify
+from ZMLB.backend import startup
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import requests
-import pandas as pd
-import base64
-from io import BytesIO
-import matplotlib.pyplot as plt
 import os
-import matplotlib
-matplotlib.use('Agg')  # ← disables GUI, uses non-interactive backend
-import matplotlib.pyplot as plt
-from ZMLB.backend.hybrid_insight_engine import generate_combined_insights
-from ZMLB.backend.trends import plot_health_trends
-# from .hybrid_insight_engine import generate_combined_insights
-# from .trends import plot_health_trends
+import time
+from datetime import datetime
+from ZMLB.backend.render_pool import render_pool
+from ZMLB.backend.cache import ENGINE_VERSION, MERGE_DUPLICATES, content_key, model_revision, result_cache
+from ZMLB.backend.metrics import begin_collect, end_collect, metrics, server_timing
+from ZMLB.backend.sniff import UploadRejected, sniff_upload
+from ZMLB.backend.compression import UPLOAD_SUFFIXES, body_rejection, gzip_request_bodies, open_upload, upload_size
+# pandas / sklearn / matplotlib live behind the engine modules (pipeline,
+# jobs, history_store, model_registry, trends), which are imported inside the
+# routes that need them; startup.start() preloads them (see startup.py)
 
 app = Flask(__name__)
+# Content-Encoding: gzip request bodies are inflated before form parsing
+app.wsgi_app = gzip_request_bodies(app.wsgi_app)
+
+# uploads bigger than this (decompressed) go through the chunked reader
+# (?stream=1 forces it)
+STREAM_THRESHOLD_BYTES = int(os.environ.get("STREAM_THRESHOLD_MB", 50)) * 1024 * 1024
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", 100_000))
 
 # added cors here frontend
 CORS(app, origins=["http://localhost:3000",
     "https://devulapellykushalhig.vercel.app"])
 
-#csv routehandler
+# every request collects its stage timings; they go out as Server-Timing
+# and into the per-route counters / latency histogram at /metrics
+@app.before_request
+def start_timing():
+    g.started = time.perf_counter()
+    g.timings, g.timings_token = begin_collect()
+
+
+@app.after_request
+def finish_timing(response):
+    if 'started' in g:
+        elapsed = time.perf_counter() - g.started
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, elapsed)
+        response.headers['Server-Timing'] = server_timing(g.timings, elapsed)
+        startup.request_served()
+    return response
+
+
+@app.teardown_request
+def stop_timing(exc=None):
+    token = g.pop('timings_token', None)
+    if token is not None:
+        end_collect(token)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+#csv routehandler. /upload/ is the same handler without the file name
+#check: csv, parquet, arrow ipc or ndjson, told apart by their first bytes
 @app.route('/upload-csv/', methods=['POST'])
+@app.route('/upload/', methods=['POST'])
 def upload_csv():
-    print("🚀 Incoming request to /upload-csv")
+    print(f"🚀 Incoming request to {request.path}")
     try:
         if 'file' not in request.files:
-            return jsonify({"error": "No file uploaded"}), 400
+            return no_file()
+        # several 'file' fields are parts of one log, merged by date (merge.py)
+        files = request.files.getlist('file')
+        if request.url_rule.rule == '/upload-csv/' and not all(f.filename.endswith(UPLOAD_SUFFIXES) for f in files):
+            return jsonify({"error": "Only CSV files allowed (.csv, .csv.gz, .csv.zst)"}), 400       
+        # compressed parts are read through a decompressing stream (compression.py)
+        streams = [open_upload(f.stream) for f in files]
+        rejected = reject_bad_uploads(files, streams)
+        if rejected is not None:
+            return rejected
+        source = streams if len(streams) > 1 else streams[0]
+        parts = ()
+        if len(files) > 1:
+            parts = tuple(content_key(f.stream) for f in files[1:]) + ('merge', MERGE_DUPLICATES)
+        stream = flag(request.args.get('stream'))
+        stream = stream or sum(upload_size(s) for s in streams) > STREAM_THRESHOLD_BYTES
+        output = response_format()
+        # optional: per-user mood model from the registry (form field or header)
+        user_id = request.form.get('user_id') or request.headers.get('X-User-Id')
+        revision = model_revision(user_id) if user_id else 0
+        key = content_key(files[0].stream, ENGINE_VERSION, 'stream' if stream else 'full', output,
+                          user_id, revision, *parts)
+        cached = result_cache.get(key)
+        if flag(request.args.get('async')):
+            from ZMLB.backend.jobs import job_queue
+            if cached is not None:
+                job = job_queue.completed(cached)
+            else:
+                job = job_queue.submit(source, stream, CSV_CHUNK_ROWS,
+                                       on_done=lambda result: result_cache.put(key, result),
+                                       output=output, user_id=user_id)
+            return jsonify({
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/jobs/{job.id}"
+            }), 202
+        if cached is None:
+            from ZMLB.backend.pipeline import analyze_csv
+            cached = analyze_csv(source, stream, CSV_CHUNK_ROWS, renderer(), output, user_id)
+            result_cache.put(key, cached)
+        return jsonify(cached)
+    except UploadRejected as e:
+        return jsonify(e.to_dict()), e.status
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+
+#job status route, ?wait=<seconds> long-polls until the job is finished
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    from ZMLB.backend.jobs import job_queue
+    job = job_queue.get(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job.to_dict())
+
+
+#history routes: append an upload to the user's stored history, then get
+#insights from the stored days without re-uploading the whole export
+@app.route('/history/<user_id>/', methods=['POST'])
+def append_history(user_id):
+    try:
+        if 'file' not in request.files:
+            return no_file()
         file = request.files['file']
-        if not file.filename.endswith('.csv'):
-            return jsonify({"error": "Only CSV files allowed"}), 400       
-        df = pd.read_csv(file)
-        print("User data:\n", df.head())
-        insights = generate_combined_insights(df)
-        fig = plot_health_trends(df)
-        buf = BytesIO()
-        fig.savefig(buf, format='png', dpi=200, bbox_inches='tight')
-        buf.seek(0)
-        img_str = base64.b64encode(buf.read()).decode()
+        if not file.filename.endswith(UPLOAD_SUFFIXES):
+            return jsonify({"error": "Only CSV files allowed (.csv, .csv.gz, .csv.zst)"}), 400
+        stream = open_upload(file.stream)
+        rejected = reject_bad_uploads([file], [stream])
+        if rejected is not None:
+            return rejected
+        from ZMLB.backend.history_store import history_store
+        from ZMLB.backend.schema import read_health_log
+        appended = history_store.append(user_id, read_health_log(stream))
+        meta = history_store.meta(user_id)
         return jsonify({
-            "insights": insights,
-            "trend_image": img_str
+            "appended": appended,
+            "rows": meta["rows"],
+            "max_date": meta["max_date"]
         })
+    except UploadRejected as e:
+        return jsonify(e.to_dict()), e.status
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+
+@app.route('/history/<user_id>/insights/', methods=['GET'])
+def history_insights(user_id):
+    bounds = {}
+    for name in ('start', 'end'):
+        value = request.args.get(name)
+        if value is None:
+            continue
+        try:
+            bounds[name] = datetime.fromisoformat(value)
+        except ValueError:
+            return jsonify({"error": f"{name} must be an ISO date (YYYY-MM-DD)"}), 400
+        if bounds[name].tzinfo is not None:
+            return jsonify({"error": f"{name} must not carry a time zone, stored days are local dates"}), 400
+    if 'start' in bounds and 'end' in bounds and bounds['start'] > bounds['end']:
+        return jsonify({"error": "start must not be after end"}), 400
+    from ZMLB.backend.hybrid_insight_engine import load_user_history
+    from ZMLB.backend.pipeline import analyze_frame, build_response
+    try:
+        df = load_user_history(user_id, bounds.get('start'), bounds.get('end'))
+        if len(df) == 0:
+            return jsonify({"error": "No stored history for this user and date range"}), 404
+        insights, analysis = analyze_frame(df, user_id)
+        return jsonify(build_response(insights, analysis, renderer(), response_format()))
     except Exception as e:
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+
+# an empty form can also mean a Content-Encoding: gzip body that failed to
+# inflate; say so instead of "no file"
+def no_file():
+    error = body_rejection(request.environ)
+    if error is not None:
+        return jsonify(error.to_dict()), error.status
+    return jsonify({"error": "No file uploaded"}), 400
+
+
+# header + first rows (or the schema, for parquet / arrow) of every uploaded
+# part against the expected columns (sniff.py); a structured 4xx before
+# pandas is even imported
+def reject_bad_uploads(files, streams):
+    for file, stream in zip(files, streams):
+        try:
+            sniff_upload(stream)
+        except UploadRejected as e:
+            body = e.to_dict()
+            body["file"] = file.filename
+            return jsonify(body), e.status
+    return None
+
+
+# ?format=series or Accept: application/vnd.vita.series+json -> json arrays
+# instead of the base64 png. the media type has to be named explicitly and
+# ranked above any wildcard (and not below application/json): curl, fetch,
+# requests and browsers send */* and keep getting the png
+SERIES_MEDIA_TYPE = 'application/vnd.vita.series+json'
+
+
+def response_format():
+    if request.args.get('format') == 'series':
+        return 'series'
+    series = 0
+    others = 0
+    json_quality = 0
+    for value, quality in request.accept_mimetypes:
+        if value == SERIES_MEDIA_TYPE:
+            series = max(series, quality)
+        elif value == 'application/json':
+            json_quality = max(json_quality, quality)
+        elif '*' in value:
+            others = max(others, quality)
+    if series > 0 and series > others and series >= json_quality:
+        return 'series'
+    return 'png'
+
+
+def flag(value):
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+def renderer():
+    if render_pool.enabled:
+        return render_pool.render
+    from ZMLB.backend.trends import render_series_png
+    return render_series_png
+
+# PRELOAD for gunicorn ZMLB.backend.api:app, flask run and the like; serve.py
+# has already picked its own mode by the time it imports this, and running
+# this module directly goes through serve below
+if __name__ != '__main__':
+    startup.start()
+
+# production: python -m ZMLB.backend.serve (pre-forked workers, see
+# serve.py). running this module directly uses the same server; set
+# FLASK_DEBUG=1 for flask's reloading development server instead
 if __name__ == '__main__':
-    port = int(os.environ.get("PORT", 10000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    if flag(os.environ.get("FLASK_DEBUG")):
+        startup.start()
+        port = int(os.environ.get("PORT", 10000))
+        app.run(host='0.0.0.0', port=port, debug=True)
+    else:
+        from ZMLB.backend import serve
+        serve.main()
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from io import BytesIO
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+from ZMLB.backend.synthetic import health_log_csv, parse_size
+from ZMLB.backend.schema import read_health_log
+from ZMLB.backend.hybrid_insight_engine import HealthAnalysis, train_mood_model
+from ZMLB.backend.rules import default_rules
+from ZMLB.backend.trends import trend_series, plot_series, figure_to_png
+
+# stage-by-stage benchmarks on synthetic logs:
+#   python -m ZMLB.backend.benchmarks --sizes 30,10k,1M --save base.json
+#   python -m ZMLB.backend.benchmarks --sizes 30,10k,1M --compare base.json
+# every stage is timed on its own (best of --repeat runs), then run once more
+# under tracemalloc for its peak python/numpy allocation. --compare exits 1
+# if any stage got slower than --threshold x its baseline
+
+BENCH_SIZES = os.environ.get("BENCH_SIZES", "30,10k,1M,10M")
+BENCH_REPEAT = int(os.environ.get("BENCH_REPEAT", 3))
+BENCH_DIR = os.environ.get("BENCH_DIR")
+
+def size_label(rows):
+    for suffix, scale in (('M', 1_000_000), ('k', 1_000)):
+        if rows >= scale and rows % scale == 0:
+            return f'{rows // scale}{suffix}'
+    return str(rows)
+
+
+# each stage is (setup, fn): setup(state) runs untimed and returns fn's
+# argument, fn's result is stored under the stage name for later stages
+def stage_parse(path):
+    return read_health_log(path)
+
+
+def stage_train(df):
+    return train_mood_model(df)
+
+
+def stage_analysis(args):
+    df, (model, le) = args
+    return HealthAnalysis(df, model, le)
+
+
+# large synthetic logs hold many users (see synthetic.health_log_csv)
+def stage_rules(df):
+    if 'user_id' in df.columns:
+        return default_rules.messages_by_user(df, 'user_id')
+    return default_rules.messages(df)
+
+
+def stage_render(analysis):
+    return plot_series(trend_series(analysis.df, analysis))
+
+
+def stage_png(fig):
+    return figure_to_png(fig)
+
+
+def stage_base64(png):
+    return base64.b64encode(png).decode()
+
+
+# whole POST /upload-csv/ round trip through the flask test client, result
+# cache off so every run does the work
+def stage_upload(args):
+    client, data = args
+    response = client.post('/upload-csv/', data={'file': (BytesIO(data), 'bench.csv')},
+                           content_type='multipart/form-data')
+    if response.status_code != 200:
+        raise RuntimeError(f"upload failed: {response.status_code} {response.get_data(as_text=True)[:200]}")
+    return response.status_code
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+STAGES = {
+    'parse': (lambda s: s['path'], stage_parse),
+    'train': (lambda s: s['parse'].copy(), stage_train),
+    'analysis': (lambda s: (s['parse'].copy(), s['train']), stage_analysis),
+    'rules': (lambda s: s['parse'], stage_rules),
+    'render': (lambda s: s['analysis'], stage_render),
+    # figure_to_png clears the figure, so every run gets a freshly drawn one
+    'png': (lambda s: stage_render(s['analysis']), stage_png),
+    'base64': (lambda s: s['png'], stage_base64),
+    'upload': (lambda s: (s['client'], _read_bytes(s['path'])), stage_upload),
+}
+
+
+def upload_client():
+    from ZMLB.backend import api
+    from ZMLB.backend.cache import ResultCache
+    api.result_cache = ResultCache(max_bytes=0, disk_dir=None)
+    return api.app.test_client()
+
+
+def measure(stage, state, repeat):
+    setup, fn = stage
+    times = []
+    result = None
+    for _ in range(repeat):
+        arg = setup(state)
+        start = time.perf_counter()
+        result = fn(arg)
+        times.append(time.perf_counter() - start)
+    arg = setup(state)
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": min(times), "mean_seconds": float(np.mean(times)), "peak_mb": peak / 2**20}
+
+
+def run(sizes, stages, repeat=BENCH_REPEAT, directory=BENCH_DIR, log=print):
+    results = {}
+    client = upload_client() if 'upload' in stages else None
+    for rows in sizes:
+        label = size_label(rows)
+        state = {'path': health_log_csv(rows, directory=directory), 'client': client}
+        results[label] = {}
+        # stages feed each other, so every stage up to the last requested one
+        # runs; only the requested ones are repeated and reported. the upload
+        # stage stands alone
+        chain = [name for name in STAGES if name != 'upload']
+        last = max([chain.index(name) for name in stages if name in chain], default=-1)
+        for name in chain[:last + 1] + (['upload'] if 'upload' in stages else []):
+            state[name], stats = measure(STAGES[name], state, repeat if name in stages else 1)
+            if name in stages:
+                results[label][name] = stats
+                log(f"{label:>6} {name:<9} {stats['seconds'] * 1000:10.2f} ms {stats['peak_mb']:10.2f} MB")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+# rows of (size, stage, baseline s, current s, ratio, regressed)
+def compare(baseline, results, threshold):
+    rows = []
+    for label, stages in results.items():
+        for name, stats in stages.items():
+            base = baseline.get("results", {}).get(label, {}).get(name)
+            if base is None:
+                continue
+            ratio = stats["seconds"] / base["seconds"] if base["seconds"] else float('inf')
+            rows.append((label, name, base["seconds"], stats["seconds"], ratio, ratio > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the insight engine stages on synthetic logs.")
+    parser.add_argument('--sizes', default=BENCH_SIZES, help="comma separated row counts, e.g. 30,10k,1M")
+    parser.add_argument('--stages', default=','.join(STAGES), help="comma separated subset of " + ','.join(STAGES))
+    parser.add_argument('--repeat', type=int, default=BENCH_REPEAT)
+    parser.add_argument('--save', help="write results as a baseline json file")
+    parser.add_argument('--compare', help="baseline json file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.10, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    results = run(sizes, stages, args.repeat)
+    report = {"environment": environment(), "results": results}
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {args.compare} (commit {baseline.get('environment', {}).get('commit')})")
+        regressed = False
+        for label, name, before, after, ratio, slower in compare(baseline, results, args.threshold):
+            regressed = regressed or slower
+            print(f"{label:>6} {name:<9} {before * 1000:10.2f} -> {after * 1000:10.2f} ms  x{ratio:5.2f}"
+                  + ("  REGRESSION" if slower else ""))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# content-addressed cache of finished /upload-csv/ responses. the key is a
+# sha256 of the uploaded bytes plus the engine version, so a repeat upload of
+# the same export skips pandas/sklearn/matplotlib entirely. memory is an LRU
+# bounded by bytes; RESULT_CACHE_DIR adds a json-file tier on disk behind it
+
+# besides the uploaded bytes, a cached result depends on these. they live
+# here, stdlib only, so building a key never imports the engine:
+# ENGINE_VERSION -> bump whenever insights or the chart change for the same
+#                   input (pipeline.py)
+# MERGE_DUPLICATES -> which copy of a repeated day a merged upload keeps
+#                   (merge.py)
+# model_revision -> the stored per-user mood model (model_registry.py),
+#                   read off its file without loading sklearn
+ENGINE_VERSION = "4"
+MERGE_DUPLICATES = os.environ.get("MERGE_DUPLICATES", "last")
+MODEL_REGISTRY_DIR = os.environ.get(
+    "MODEL_REGISTRY_DIR", os.path.join(tempfile.gettempdir(), 'vita-model-registry'))
+
+RESULT_CACHE_MB = int(os.environ.get("RESULT_CACHE_MB", 64))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR")
+RESULT_CACHE_DISK_MB = int(os.environ.get("RESULT_CACHE_DISK_MB", 1024))
+HASH_BLOCK = 1024 * 1024
+
+
+def model_path(user_id, root=MODEL_REGISTRY_DIR):
+    name = hashlib.sha256(str(user_id).encode()).hexdigest()
+    return os.path.join(root, name + '.joblib')
+
+
+# changes whenever the stored model does; 0 while the user has none
+def model_revision(user_id, root=MODEL_REGISTRY_DIR):
+    try:
+        return os.stat(model_path(user_id, root)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def content_key(fileobj, *parts):
+    h = hashlib.sha256()
+    start = fileobj.tell()
+    while True:
+        block = fileobj.read(HASH_BLOCK)
+        if not block:
+            break
+        h.update(block)
+    fileobj.seek(start)
+    for part in parts:
+        h.update(b'\0' + str(part).encode())
+    return h.hexdigest()
+
+
+def result_size(result):
+    size = len(result.get("trend_image", "")) + sum(len(m) for m in result.get("insights", []))
+    if "trend" in result:
+        size += sum(len(v) * 8 for v in result["trend"].values())
+    return size
+
+
+class ResultCache:
+    def __init__(self, max_bytes=RESULT_CACHE_MB * 1024 * 1024, disk_dir=RESULT_CACHE_DIR,
+                 max_disk_bytes=RESULT_CACHE_DISK_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = self._disk_get(key)
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_memory(key, result)
+        return result
+
+    def put(self, key, result):
+        with self.lock:
+            self._put_memory(key, result)
+        self._disk_put(key, result)
+
+    def _put_memory(self, key, result):
+        size = result_size(result)
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= result_size(self.entries.pop(key))
+        self.entries[key] = result
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= result_size(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + '.json')
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)  # mtime doubles as the disk tier's lru clock
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key, result):
+        if not self.disk_dir:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp, self._disk_path(key))
+            self._disk_prune()
+        except OSError:
+            pass
+
+    def _disk_prune(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.disk_dir,
+            }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,228 @@
+import io
+import os
+import zlib
+import gzip
+from ZMLB.backend.sniff import UploadRejected
+
+# compressed uploads: a part named .csv.gz / .csv.zst (or just starting with
+# the gzip / zstd magic bytes) is read through a decompressing stream, so
+# the sniffer, the chunked parser and the job spooler all see plain csv
+# bytes while only the compressed upload sits in werkzeug's temp file. a
+# whole request body sent with Content-Encoding: gzip is decompressed the
+# same way before werkzeug parses the form (gzip_request_bodies).
+#
+# the readers can seek: forward by reading on, backward by restarting the
+# decompressor, which is what the two streaming passes and the sniffer's
+# peek need. MAX_DECOMPRESSED_MB caps what one upload may inflate to (413
+# past it) so a small bomb can't fill the disk or the parser.
+# zstd needs the optional zstandard package; without it .zst uploads get a 415
+
+MAX_DECOMPRESSED_BYTES = int(os.environ.get("MAX_DECOMPRESSED_MB", 4096)) * 1024 * 1024
+
+UPLOAD_SUFFIXES = ('.csv', '.csv.gz', '.csv.zst')
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+COPY_BLOCK = 1024 * 1024
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise UploadRejected(415, 'unsupported_compression',
+                             "zstd uploads need the zstandard package on the server (pip install zstandard).")
+    return zstandard
+
+
+def detect_compression(raw):
+    start = raw.tell()
+    magic = raw.read(4)
+    raw.seek(start)
+    if magic[:2] == GZIP_MAGIC:
+        return 'gzip'
+    if magic == ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+
+class Decompressed(io.RawIOBase):
+    def __init__(self, raw, codec, limit=MAX_DECOMPRESSED_BYTES):
+        self.raw = raw
+        self.codec = codec
+        self.limit = limit
+        self.start = raw.tell()
+        self.reader = None
+        self.position = 0
+        self._open()
+
+    def _open(self):
+        self.raw.seek(self.start)
+        if self.codec == 'gzip':
+            self.reader = gzip.GzipFile(fileobj=self.raw, mode='rb')
+            self.errors = (OSError, EOFError, zlib.error)
+        else:
+            zstandard = _zstandard()
+            self.reader = zstandard.ZstdDecompressor().stream_reader(
+                self.raw, read_across_frames=True, closefd=False)
+            self.errors = (zstandard.ZstdError,)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def readinto(self, buffer):
+        try:
+            n = self.reader.readinto(buffer)
+        except self.errors as e:
+            raise UploadRejected(400, 'bad_compression', f"The {self.codec} data is corrupt or truncated.",
+                                 {"detail": str(e)}) from e
+        self.position += n
+        if self.position > self.limit:
+            raise UploadRejected(413, 'too_large',
+                                 f"The upload decompresses to more than {self.limit // 2**20} MB.")
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("decompressed uploads can only seek from the start")
+        if offset < self.position:
+            self._open()
+        skip = bytearray(min(COPY_BLOCK, max(offset - self.position, 1)))
+        while self.position < offset:
+            view = memoryview(skip)[:min(len(skip), offset - self.position)]
+            if not self.readinto(view):
+                break
+        return self.position
+
+    # decompressed size without decompressing: gzip keeps it (mod 4 GiB) in
+    # the trailer, zstd in the frame header when the writer knew it. None
+    # when it isn't recorded
+    def size_hint(self):
+        position = self.position
+        end = self.raw.seek(0, io.SEEK_END)
+        try:
+            if self.codec == 'gzip' and end - self.start >= 18:
+                self.raw.seek(end - 4)
+                return int.from_bytes(self.raw.read(4), 'little')
+            if self.codec == 'zstd':
+                self.raw.seek(self.start)
+                size = _zstandard().frame_content_size(self.raw.read(18))
+                return size if size >= 0 else None
+            return None
+        finally:
+            self._open()
+            self.seek(position)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+        super().close()
+
+
+# the stream to parse for an uploaded part; plain files come back as they are
+def open_upload(raw):
+    codec = detect_compression(raw)
+    if codec is None:
+        return raw
+    return Decompressed(raw, codec)
+
+
+def upload_size(stream):
+    if isinstance(stream, Decompressed):
+        hint = stream.size_hint()
+        if hint is not None:
+            return hint
+        stream = stream.raw
+    position = stream.tell()
+    size = stream.seek(0, io.SEEK_END)
+    stream.seek(position)
+    return size
+
+
+# wsgi middleware: a Content-Encoding: gzip request body is inflated on the
+# fly. the length is unknown afterwards, so the input is marked terminated
+# for werkzeug to read it to the end. werkzeug's form parser swallows read
+# errors (the form just comes out empty), so the reader is left in the
+# environ and body_rejection() tells the route what went wrong
+REQUEST_BODY_KEY = 'vita.request_body'
+
+
+def gzip_request_bodies(wsgi_app):
+    def app(environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding in ('gzip', 'x-gzip'):
+            environ = dict(environ)
+            body = environ['wsgi.input']
+            reader = environ[REQUEST_BODY_KEY] = _RequestBody(body)
+            environ['wsgi.input'] = io.BufferedReader(reader)
+            environ['wsgi.input_terminated'] = True
+            environ.pop('CONTENT_LENGTH', None)
+            environ.pop('HTTP_CONTENT_ENCODING', None)
+        return wsgi_app(environ, start_response)
+    return app
+
+
+def body_rejection(environ):
+    reader = environ.get(REQUEST_BODY_KEY)
+    return reader.error if reader is not None else None
+
+
+# one-pass inflate of a (non-seekable) request body
+class _RequestBody(io.RawIOBase):
+    def __init__(self, body, limit=MAX_DECOMPRESSED_BYTES):
+        self.body = body
+        self.limit = limit
+        self.inflater = zlib.decompressobj(wbits=31)
+        self.pending = b''
+        self.offset = 0
+        self.total = 0
+        self.error = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        try:
+            return self._readinto(buffer)
+        except UploadRejected as e:
+            self.error = e
+            raise
+
+    def _fill(self):
+        while self.offset == len(self.pending):
+            data = self.inflater.unconsumed_tail
+            if not data and self.inflater.eof:
+                # concatenated gzip members
+                data = self.inflater.unused_data or self.body.read(COPY_BLOCK)
+                if not data:
+                    return
+                self.inflater = zlib.decompressobj(wbits=31)
+            elif not data:
+                data = self.body.read(COPY_BLOCK)
+                if not data:
+                    raise UploadRejected(400, 'bad_compression', "The gzip request body is truncated.")
+            try:
+                self.pending = self.inflater.decompress(data, COPY_BLOCK)
+            except zlib.error as e:
+                raise UploadRejected(400, 'bad_compression', "The gzip request body is corrupt.",
+                                     {"detail": str(e)}) from e
+            self.offset = 0
+
+    def _readinto(self, buffer):
+        self._fill()
+        n = min(len(buffer), len(self.pending) - self.offset)
+        buffer[:n] = self.pending[self.offset:self.offset + n]
+        self.offset += n
+        self.total += n
+        if self.total > self.limit:
+            raise UploadRejected(413, 'too_large',
+                                 f"The request body decompresses to more than {self.limit // 2**20} MB.")
+        return n
@@ -0,0 +1,86 @@
+import os
+import numpy as np
+import pandas as pd
+
+# point-budget downsampling for the trend chart. both methods return row
+# positions to keep, so every column of a row stays aligned after slicing
+#   lttb   -> largest-triangle-three-buckets, keeps the visual shape
+#   minmax -> min and max of each bucket, keeps every spike
+
+TREND_POINT_BUDGET = int(os.environ.get("TREND_POINT_BUDGET", 1000))
+DOWNSAMPLE_METHOD = os.environ.get("DOWNSAMPLE_METHOD", "lttb")
+
+
+def _fill_nan(y):
+    y = np.asarray(y, dtype=float)
+    mask = np.isnan(y)
+    if mask.all():
+        return np.zeros_like(y)
+    if mask.any():
+        y = np.where(mask, np.nanmean(y), y)
+    return y
+
+
+def lttb_indices(y, threshold=TREND_POINT_BUDGET):
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = _fill_nan(y)
+    x = np.arange(n, dtype=float)
+
+    # first and last points are always kept, the rest is split into
+    # threshold - 2 buckets and each picks the point with the largest
+    # triangle against the previous pick and the next bucket's average
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    picked = np.empty(threshold, dtype=int)
+    picked[0] = 0
+    picked[-1] = n - 1
+    prev = 0
+    for b in range(threshold - 2):
+        start, end = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            nxt_start, nxt_end = edges[b + 1], edges[b + 2]
+        else:
+            nxt_start, nxt_end = n - 1, n
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+        area = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev])
+                      - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(area.argmax())
+        picked[b + 1] = prev
+    return picked
+
+
+def minmax_indices(y, threshold=TREND_POINT_BUDGET):
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    buckets = threshold // 2
+    bucket = (np.arange(n) * buckets) // n
+    values = pd.Series(np.asarray(y, dtype=float))
+    # gaps are left out before grouping: idxmin / idxmax raise on a bucket
+    # that is all NaN (an unmapped mood, a blank stretch), which then just
+    # keeps no point of its own
+    valid = values.notna().to_numpy()
+    grouped = values[valid].groupby(bucket[valid])
+    idx = np.concatenate([grouped.idxmin().to_numpy(),
+                          grouped.idxmax().to_numpy(),
+                          [0, n - 1]]).astype(int)
+    return np.unique(idx)
+
+
+METHODS = {
+    'lttb': lttb_indices,
+    'minmax': minmax_indices,
+}
+
+
+# union of the points each series wants to keep, so the chart stays within
+# roughly len(columns) * threshold points whatever the row count
+def downsample_series(series, columns, threshold=TREND_POINT_BUDGET, method=DOWNSAMPLE_METHOD):
+    n = len(series[columns[0]])
+    if n <= threshold:
+        return series
+    pick = METHODS[method]
+    idx = np.unique(np.concatenate([pick(series[col], threshold) for col in columns]))
+    return {col: values[idx] for col, values in series.items()}
@@ -0,0 +1,162 @@
+import os
+from ZMLB.backend.compression import Decompressed
+from ZMLB.backend.sniff import NUMERIC_COLUMNS, UploadRejected, column_renames, detect_format
+
+# non-csv uploads: parquet, arrow ipc (file and stream) and ndjson, as
+# detected by sniff.detect_format. they are read with pyarrow into an arrow
+# table, never through text parsing for the binary ones, and handed to
+# schema.py in the same shape the csv reader produces:
+#   numbers      -> float32 in arrow, so compact_health_log's downcast is the
+#                   only conversion and nothing goes through python objects
+#   mood, text dates -> dictionary encoded, so they arrive as categoricals
+#                   (every distinct mood / day converted once)
+#   date32 / timestamps -> datetime64 directly
+# to_pandas runs with split_blocks + self_destruct: each column becomes its
+# own block built straight from the arrow buffer (no consolidation copy) and
+# the arrow memory is released column by column as it goes. files given by
+# path are memory-mapped, which makes arrow ipc loads zero-copy.
+# chunked reads go record batch by record batch (parquet row groups are
+# re-batched to chunk_rows). pyarrow is imported on first use, like the
+# history store; without it these formats get a 415.
+# parquet and arrow files are read from their footer, which a decompressing
+# stream can't seek to, so inside a .gz / .zst wrapper they get a 415 too;
+# both compress internally already. arrow streams and ndjson read front to
+# back and work compressed
+
+NDJSON_BLOCK_BYTES = int(os.environ.get("NDJSON_BLOCK_MB", 16)) * 1024 * 1024
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.json
+        import pyarrow.parquet
+    except ImportError:
+        raise UploadRejected(415, 'unsupported_format',
+                             "Parquet, Arrow and NDJSON uploads need pyarrow on the server (pip install pyarrow).")
+    return pyarrow
+
+
+def _bad_file(fmt, e):
+    return UploadRejected(400, 'bad_file', f"The {fmt} data could not be read.", {"detail": str(e)})
+
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+RANDOM_ACCESS_FORMATS = ('parquet', 'arrow')
+
+
+def _check_seekable(source, fmt):
+    if fmt in RANDOM_ACCESS_FORMATS and isinstance(source, Decompressed):
+        raise UploadRejected(415, 'unsupported_compression',
+                             f"{fmt.capitalize()} files can't be read from a {source.codec} wrapper; "
+                             f"upload the .{fmt} file as it is (it is compressed internally).",
+                             {"format": fmt, "compression": source.codec})
+
+
+# 'csv', 'parquet', 'arrow', 'arrow_stream' or 'ndjson' for a stream or a path
+def source_format(source):
+    if not _is_path(source):
+        return detect_format(source)
+    with open(source, 'rb') as f:
+        return detect_format(f)
+
+
+def _source(source, fmt):
+    if not _is_path(source):
+        return source
+    if fmt in ('arrow', 'arrow_stream'):
+        return _pyarrow().memory_map(os.fspath(source))
+    return os.fspath(source)
+
+
+# (column names, row count or None) from the schema / footer only
+def columnar_header(fileobj, fmt):
+    _check_seekable(fileobj, fmt)
+    pa = _pyarrow()
+    start = fileobj.tell()
+    try:
+        if fmt == 'parquet':
+            metadata = pa.parquet.ParquetFile(fileobj).metadata
+            return metadata.schema.to_arrow_schema().names, metadata.num_rows
+        if fmt == 'arrow':
+            reader = pa.ipc.open_file(fileobj)
+            return reader.schema.names, 0 if reader.num_record_batches == 0 else None
+        return pa.ipc.open_stream(fileobj).schema.names, None
+    except (pa.ArrowException, OSError) as e:
+        raise _bad_file(fmt, e) from e
+    finally:
+        fileobj.seek(start)
+
+
+def _engine_table(table):
+    pa = _pyarrow()
+    import pyarrow.compute as pc
+    renames = column_renames(table.column_names)
+    table = table.rename_columns([renames.get(name, name) for name in table.column_names])
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        kind = column.type
+        if name in NUMERIC_COLUMNS and (pa.types.is_integer(kind) or pa.types.is_floating(kind)):
+            column = column.cast(pa.float32())
+        elif (name == 'mood' or name == 'date') and (pa.types.is_string(kind) or pa.types.is_large_string(kind)):
+            column = pc.dictionary_encode(column)
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+
+def _to_frame(table):
+    return _engine_table(table).to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+
+
+def read_table(source, fmt):
+    _check_seekable(source, fmt)
+    pa = _pyarrow()
+    source = _source(source, fmt)
+    try:
+        if fmt == 'parquet':
+            return pa.parquet.read_table(source, memory_map=isinstance(source, str))
+        if fmt == 'arrow':
+            return pa.ipc.open_file(source).read_all()
+        if fmt == 'arrow_stream':
+            return pa.ipc.open_stream(source).read_all()
+        return pa.json.read_json(source)
+    except (pa.ArrowException, OSError) as e:
+        raise _bad_file(fmt, e) from e
+
+
+def read_frame(source, fmt):
+    return _to_frame(read_table(source, fmt))
+
+
+def _batches(source, fmt, chunk_rows):
+    pa = _pyarrow()
+    if fmt == 'parquet':
+        yield from pa.parquet.ParquetFile(source).iter_batches(batch_size=chunk_rows)
+    elif fmt == 'arrow':
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    elif fmt == 'arrow_stream':
+        yield from pa.ipc.open_stream(source)
+    else:
+        options = pa.json.ReadOptions(block_size=NDJSON_BLOCK_BYTES)
+        yield from pa.json.open_json(source, read_options=options)
+
+
+# record batches as DataFrames; ipc / ndjson batches keep the writer's size
+def read_frame_chunks(source, fmt, chunk_rows):
+    _check_seekable(source, fmt)
+    pa = _pyarrow()
+    batches = _batches(_source(source, fmt), fmt, chunk_rows)
+    while True:
+        try:
+            batch = next(batches, None)
+        except (pa.ArrowException, OSError) as e:
+            raise _bad_file(fmt, e) from e
+        if batch is None:
+            return
+        yield _to_frame(pa.Table.from_batches([batch]))
@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import pandas as pd
+from ZMLB.backend.schema import date_indexed, parse_dates
+from ZMLB.backend.locks import UserLock
+
+# per-user health history in parquet, append-only. every user gets a
+# directory of part files plus a small _meta.json that records each part's
+# date range, so reads only open the parts that overlap the requested window
+# and only decode the requested columns:
+#   <HISTORY_STORE_DIR>/<sha256(user_id)>/part-00000.parquet
+#                                         part-00001.parquet
+#                                         _meta.json
+# appends and compactions for a user hold a UserLock (locks.py) on
+# <sha256(user_id)>.lock beside the directory, so gunicorn workers and job
+# processes writing the same user take turns over _meta.json and part names.
+# pyarrow is imported on first use so the rest of the backend runs without it
+
+HISTORY_STORE_DIR = os.environ.get(
+    "HISTORY_STORE_DIR", os.path.join(tempfile.gettempdir(), 'vita-history'))
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("The history store needs pyarrow (pip install pyarrow).") from e
+    return pyarrow
+
+
+class HistoryStore:
+    def __init__(self, root=HISTORY_STORE_DIR):
+        self.root = root
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def _user_dir(self, user_id):
+        return os.path.join(self.root, hashlib.sha256(str(user_id).encode()).hexdigest())
+
+    def _user_lock(self, user_id):
+        with self.lock:
+            thread_lock = self.locks.setdefault(user_id, threading.Lock())
+        return UserLock(thread_lock, self._user_dir(user_id) + '.lock')
+
+    def _read_meta(self, user_dir):
+        try:
+            with open(os.path.join(user_dir, '_meta.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"parts": [], "rows": 0, "max_date": None, "next_part": 0}
+
+    def _write_meta(self, user_dir, meta):
+        fd, tmp = tempfile.mkstemp(dir=user_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(user_dir, '_meta.json'))
+
+    def _next_part(self, meta):
+        name = f"part-{meta['next_part']:05d}.parquet"
+        meta["next_part"] += 1
+        return name
+
+    def meta(self, user_id):
+        return self._read_meta(self._user_dir(user_id))
+
+    # appends the days newer than anything stored; older or repeated days are
+    # skipped so re-uploading an overlapping export never duplicates rows
+    def append(self, user_id, df):
+        pa = _pyarrow()
+        if 'date' not in df.columns:
+            raise ValueError("Missing 'date' column, history rows are keyed by date.")
+        df = df.assign(date=parse_dates(df['date']))
+        df = df.dropna(subset=['date'])
+
+        user_dir = self._user_dir(user_id)
+        with self._user_lock(user_id):
+            os.makedirs(user_dir, exist_ok=True)
+            meta = self._read_meta(user_dir)
+            if meta["max_date"] is not None:
+                df = df[df['date'] > pd.Timestamp(meta["max_date"])]
+            df = date_indexed(df.drop_duplicates(subset='date', keep='last'))
+            if len(df) == 0:
+                return 0
+
+            name = self._next_part(meta)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            tmp = os.path.join(user_dir, name + '.tmp')
+            pa.parquet.write_table(table, tmp)
+            os.replace(tmp, os.path.join(user_dir, name))
+
+            meta["parts"].append({
+                "file": name,
+                "rows": len(df),
+                "min_date": df['date'].min().isoformat(),
+                "max_date": df['date'].max().isoformat(),
+            })
+            meta["rows"] += len(df)
+            meta["max_date"] = meta["parts"][-1]["max_date"]
+            self._write_meta(user_dir, meta)
+            return len(df)
+
+    # columns=None reads everything; start/end are inclusive date bounds
+    def read(self, user_id, columns=None, start=None, end=None):
+        pa = _pyarrow()
+        user_dir = self._user_dir(user_id)
+        meta = self._read_meta(user_dir)
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        filters = []
+        if start is not None:
+            filters.append(('date', '>=', start))
+        if end is not None:
+            filters.append(('date', '<=', end))
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(['date'] + list(columns)))
+
+        tables = []
+        for part in meta["parts"]:
+            if start is not None and pd.Timestamp(part["max_date"]) < start:
+                continue
+            if end is not None and pd.Timestamp(part["min_date"]) > end:
+                continue
+            tables.append(pa.parquet.read_table(
+                os.path.join(user_dir, part["file"]),
+                columns=read_columns,
+                filters=filters or None,
+            ))
+        if not tables:
+            return pd.DataFrame(columns=read_columns or ['date'])
+        table = pa.concat_tables(tables, promote_options='default')
+        # parts are appended in date order, so this only builds the index
+        return date_indexed(table.to_pandas())
+
+    # rewrite all parts as one file; append-only means part count only grows
+    def compact(self, user_id):
+        pa = _pyarrow()
+        user_dir = self._user_dir(user_id)
+        with self._user_lock(user_id):
+            meta = self._read_meta(user_dir)
+            if len(meta["parts"]) <= 1:
+                return meta
+            df = self.read(user_id)
+            name = self._next_part(meta)
+            tmp = os.path.join(user_dir, name + '.tmp')
+            pa.parquet.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp)
+            os.replace(tmp, os.path.join(user_dir, name))
+            old = [part["file"] for part in meta["parts"]]
+            meta["parts"] = [{
+                "file": name,
+                "rows": len(df),
+                "min_date": df['date'].min().isoformat(),
+                "max_date": df['date'].max().isoformat(),
+            }]
+            self._write_meta(user_dir, meta)
+            for file in old:
+                os.remove(os.path.join(user_dir, file))
+            return meta
+
+
+history_store = HistoryStore()
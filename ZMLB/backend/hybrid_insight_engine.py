@@ -1,15 +1,24 @@
-import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 import warnings
+import numpy as np
+from ZMLB.backend.mood_scoring import export_mood_model
+from ZMLB.backend.history_store import history_store
+from ZMLB.backend.schema import read_health_log
+from ZMLB.backend.rules import default_rules
+from ZMLB.backend.metrics import stage
 warnings.filterwarnings('ignore')
 
 # load and preprocess the
 def load_health_logs(filepath):
-    df = pd.read_csv(filepath, parse_dates=['date'])
-    df.sort_values('date', inplace=True)
-    return df
+    # already in date order with a date index (see schema.date_indexed)
+    return read_health_log(filepath)
+
+# stored history for a user (see history_store.py), only the needed columns
+# and dates are read
+def load_user_history(user_id, start=None, end=None, columns=None):
+    return history_store.read(user_id, columns=columns, start=start, end=end)
 
 # trainfor mood prediction---1
 # rule-based hydration check---2
@@ -17,107 +26,95 @@ def load_health_logs(filepath):
 # rule-based steps check---4
 # ml-based mood insight---5
 
+FEATURES = ['sleep_hours', 'hydration_ml', 'steps']
+
+
+# rows with a blank feature or mood can't be fitted on and are left out, as
+# OnlineMoodModel.partial_fit does; (None, None) when the complete rows hold
+# fewer than two moods (a one-day log, an all-'okay' log), since a
+# classifier needs two classes to fit
 def train_mood_model(df):
+    df = df.dropna(subset=FEATURES + ['mood'])
+    if df['mood'].nunique() < 2:
+        return None, None
     le = LabelEncoder()
-    df['mood_encoded'] = le.fit_transform(df['mood'])
+    y = le.fit_transform(df['mood'])
 
-    X = df[['sleep_hours', 'hydration_ml', 'steps']]
-    y = df['mood_encoded']
+    X = df[FEATURES]
 
     model = LogisticRegression()
     model.fit(X, y)
     return model, le
 
 
-def analyze_hydration(df):
-    if 'hydration_ml' not in df.columns:
-        return "⚠️ 'hydration_ml' column missing. Hydration analysis skipped."
-    low_hydration_days = df[df['hydration_ml'] < 2200]
-    print("****** low hydrate : " , len(low_hydration_days))
-    print()
-    if len(low_hydration_days) >= 5:
-        return "🚱 You've been underhydrated for 5 days straight! Your body needs more fluids urgently."
-    elif len(low_hydration_days) == 4:
-        return "⚠️ You've had 4 days of low water intake. Time to focus on staying hydrated!"
-    elif len(low_hydration_days) == 3:
-        return "🚰 Your hydration has been low for 3 or more days. Increase water intake."
-    elif len(low_hydration_days) == 2:
-        return "💧 You’ve had low hydration for 2 days. Try to drink more water today."
-    elif len(low_hydration_days) == 1:
-        return "🫗 Yesterday’s water intake was low. Stay hydrated today!"
-    else:
-        return None
-
-
-def analyze_sleep(df):
-    if 'sleep_hours' not in df.columns:
-        return "⚠️ 'sleep_hours' column missing. Sleep analysis skipped."
-    low_sleep_days = df[df['sleep_hours'] < 6]
-    print("_____************",len(low_sleep_days))
-    if len(low_sleep_days) >= 5:
-        return "🛌 You've been sleep-deprived for 5 days in a row! Prioritize proper rest to recover."
-    elif len(low_sleep_days) == 4:
-        return "⚠️ Four days of poor sleep detected. Make time for rest before it impacts your health."
-    elif len(low_sleep_days) == 3:
-        return "😴 Your sleep has been below 6 hours for multiple days. Aim for 7–8 hours of rest."
-    elif len(low_sleep_days) == 2:
-        return "⏰ Two days of low sleep logged. Try to wind down earlier tonight."
-    elif len(low_sleep_days) == 1:
-        return "🫣 You didn’t get enough sleep yesterday. Rest well tonight!"
-    else:
-        return None
-
-
-def analyze_steps(df):
-    if 'steps' not in df.columns:
-        return "⚠️ 'steps' column missing. Steps analysis skipped."
-    avg_steps = df['steps'].mean()
-    if avg_steps < 3000:
-        return f"🛑 Your average steps ({int(avg_steps)}) are very low. Try taking short walks throughout the day to stay active."
-    elif avg_steps < 5000:
-        return f"🚶‍♂️ Your average steps ({int(avg_steps)}) are lower than the healthy range. Try to stay more active."
-    elif avg_steps < 8000:
-        return f"🚶‍♀️ You're getting some movement with {int(avg_steps)} steps daily. A little more effort can put you in the optimal range!"
-    elif avg_steps < 10000:
-        return f"👏 Great job! You're averaging {int(avg_steps)} steps. Keep going to hit the ideal target!"
-    else:
-        return f"🏃‍♂️ Fantastic! {int(avg_steps)} steps a day puts you in top shape. Stay consistent!"
-
-
-def analyze_mood_with_ml(df, model, le):
-    if model is None or le is None:
+# one analysis pass per upload: encode + train + predict happen here once and
+# both the insight rules and the trend plotter read the results. predictions
+# go through the exported scorer (mood_scoring.py), which needs every one of
+# FEATURES: rows with a blank feature, or every row when a feature column is
+# missing, get no predicted mood (None)
+class HealthAnalysis:
+    def __init__(self, df, model=None, le=None):
+        self.df = df
+        if model is None or le is None:
+            with stage('fit'):
+                model, le = train_mood_model(df)
+        self.model = model
+        self.le = le
+        self.scorer = export_mood_model(model, le) if model is not None else None
+        self.features = [col for col in FEATURES if col in df.columns]
+        with stage('predict'):
+            if self.scorer is None or self.features != FEATURES:
+                df['predicted_mood'] = None
+            else:
+                X = df[FEATURES].to_numpy(dtype='float64')
+                complete = ~np.isnan(X).any(axis=1)
+                if complete.all():
+                    df['predicted_mood'] = self.scorer.predict_labels(X)
+                else:
+                    predicted = np.full(len(df), None, dtype=object)
+                    predicted[complete] = self.scorer.predict_labels(X[complete])
+                    df['predicted_mood'] = predicted
+
+    @property
+    def predicted_mood(self):
+        return self.df.get('predicted_mood')
+
+
+# the sad-day check, over the predictions HealthAnalysis already made
+def analyze_predicted_mood(analysis):
+    if analysis.model is None or analysis.le is None:
         return "⚠️ Mood prediction skipped due to missing required columns."
-    features = [col for col in ['sleep_hours', 'hydration_ml', 'steps'] if col in df.columns]
-    if not features:
+    if not analysis.features:
         return "⚠️ Insufficient features for mood prediction."
-    df['predicted_mood'] = le.inverse_transform(model.predict(df[features]))
-    sad_days = df[df['predicted_mood'] == 'sad']
-    if len(sad_days) >= 5:
+    sad_days = analysis.df[analysis.predicted_mood == 'sad']
+    return mood_message(len(sad_days))
+
+
+def mood_message(sad_days):
+    if sad_days >= 5:
         return "💔 You’ve reported feeling low for 5 days. It might be time to talk to someone or take a mental health break."
-    elif len(sad_days) == 4:
+    elif sad_days == 4:
         return "😟 You've had 4 down days recently. Try practicing self-care, connecting with loved ones, or reflecting on stressors."
-    elif len(sad_days) == 3:
+    elif sad_days == 3:
         return "🧠 Mood patterns suggest fatigue or stress. Consider self-care, better sleep, and hydration."
-    elif len(sad_days) == 2:
+    elif sad_days == 2:
         return "🙁 Noticing a dip in mood the last 2 days. Take time for yourself and do something that brings you joy."
-    elif len(sad_days) == 1:
+    elif sad_days == 1:
         return "😕 You logged a sad mood recently. Keep an eye on how you're feeling—it's okay to take a break."
     else:
         return None
 
-# combined engine
-def generate_combined_insights(df):
-    insights = []
-
-    model, le = train_mood_model(df)
+# combined engine: the metric rules (see rules.py) are evaluated together in
+# one pass, the model-based mood check is appended after them
+def generate_combined_insights(df, analysis=None, rules=default_rules):
+    if analysis is None:
+        analysis = HealthAnalysis(df)
 
-    
-    for fn in [analyze_hydration, analyze_sleep, analyze_steps]:
-        msg = fn(df)
-        if msg:
-            insights.append(msg)
+    with stage('rules'):
+        insights = rules.messages(df)
 
-    mood_msg = analyze_mood_with_ml(df, model, le)
+    with stage('mood'):
+        mood_msg = analyze_predicted_mood(analysis)
     if mood_msg:
         insights.append(mood_msg)
 
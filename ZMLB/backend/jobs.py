@@ -0,0 +1,152 @@
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ZMLB.backend.pipeline import analyze_csv_file_timed
+from ZMLB.backend.metrics import record_all
+from ZMLB.backend.streaming import CHUNK_ROWS
+
+# async analysis jobs: the route spools the upload to disk, submits it to a
+# local process pool and returns a job id straight away. job state lives in
+# this process only, so with several api processes a client has to poll the
+# one that accepted the job (sticky sessions or a single api process)
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", os.cpu_count() or 1))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", 15 * 60))
+MAX_WAIT_SECONDS = 30
+
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        body = {"job_id": self.id, "status": self.status}
+        if self.status == "done":
+            body.update(self.result)
+        elif self.status == "failed":
+            body["error"] = self.error
+        return body
+
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, ttl=JOB_TTL_SECONDS):
+        self.workers = workers
+        self.ttl = ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.pool = None
+
+    # spawn, not fork: the api process may already be running threads
+    def _get_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return self.pool
+
+    # a worker that dies (oom kill etc.) breaks the whole executor, so start
+    # a fresh one and retry once
+    def _submit(self, fn, *args):
+        with self.lock:
+            pool = self._get_pool()
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            with self.lock:
+                if self.pool is pool:
+                    self.pool = None
+                pool = self._get_pool()
+            return pool.submit(fn, *args)
+
+    # on_done(result) runs in the parent once the job succeeds. fileobj can
+    # be a list of parts, each spooled to its own file
+    def submit(self, fileobj, stream=False, chunk_rows=CHUNK_ROWS, on_done=None, output='png',
+               user_id=None):
+        paths = [self._spool(f) for f in (fileobj if isinstance(fileobj, (list, tuple)) else [fileobj])]
+        path = paths if isinstance(fileobj, (list, tuple)) else paths[0]
+
+        job = Job()
+        with self.lock:
+            self._expire()
+            self.jobs[job.id] = job
+
+        try:
+            future = self._submit(analyze_csv_file_timed, path, stream, chunk_rows, output, user_id)
+        except Exception:
+            for p in paths:
+                os.remove(p)
+            with self.lock:
+                self.jobs.pop(job.id, None)
+            raise
+        job.status = "running"
+        future.add_done_callback(lambda f: self._finish(job, f, on_done))
+        return job
+
+    def _spool(self, fileobj):
+        fd, path = tempfile.mkstemp(prefix='vita-job-', suffix='.csv')
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(fileobj, out)
+        return path
+
+    # register a job whose result is already known (e.g. a cache hit) so
+    # async clients still get the usual job id / poll flow
+    def completed(self, result):
+        job = Job()
+        job.result = result
+        job.status = "done"
+        job.finished = time.time()
+        job.done.set()
+        with self.lock:
+            self._expire()
+            self.jobs[job.id] = job
+        return job
+
+    def _finish(self, job, future, on_done=None):
+        try:
+            job.result, timings = future.result()
+            record_all(timings)
+            job.status = "done"
+            if on_done is not None:
+                on_done(job.result)
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        job.finished = time.time()
+        job.done.set()
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.finished is not None and now - job.finished > self.ttl:
+                del self.jobs[job_id]
+
+    # wait > 0 long-polls: blocks until the job finishes or the timeout hits
+    def get(self, job_id, wait=0):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if wait > 0:
+            job.done.wait(min(wait, MAX_WAIT_SECONDS))
+        return job
+
+    def shutdown(self, wait=True):
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait)
+            self.pool = None
+
+
+job_queue = JobQueue()
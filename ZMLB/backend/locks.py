@@ -0,0 +1,43 @@
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # windows: the locks only order the threads of one process
+    fcntl = None
+
+# per-user locks for state kept on local disk (model_registry.py,
+# history_store.py) that every gunicorn worker and job process reads and
+# rewrites. the thread lock orders this process's requests; flock on a
+# sidecar file orders the processes sharing the directory. the kernel drops
+# the flock if a process dies holding it. stdlib only
+
+
+class UserLock:
+    def __init__(self, thread_lock, path):
+        self.thread_lock = thread_lock
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is None:
+            return self
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._close()
+            self.thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._close()
+        self.thread_lock.release()
+
+    def _close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from ZMLB.backend.schema import compact_health_log, date_indexed, read_health_log_chunks
+from ZMLB.backend.cache import MERGE_DUPLICATES
+
+# one date-ordered log out of several uploaded parts (consecutive exports,
+# split files), without concatenating and re-sorting everything.
+#
+# every part is read as a stream of chunks; a thread per part keeps its
+# next chunk parsing while the current ones are merged, so the parts parse
+# in parallel (pandas' csv tokenizer runs without the GIL). the merge is a
+# block-wise k-way merge: a part's buffered rows end at some date, and no
+# later chunk of that part can go below it, so everything dated before the
+# smallest such date over the unfinished parts is final and goes out as the
+# next block. a day equal to that date is held back until every part has
+# moved past it, so all copies of a day always land in the same block and
+# MERGE_DUPLICATES decides which one survives:
+#   last  -> the copy from the later part (or later row) wins (default)
+#   first -> the earliest copy wins
+#   mean  -> numbers are averaged, mood comes from the last copy
+#
+# parts are expected in date order, as exports are. rows inside a chunk are
+# sorted anyway; a part that jumps back in time across chunks still merges,
+# its late rows just go out with the next block. rows without a date are
+# dropped since they can't be placed
+
+MERGE_WORKERS = int(os.environ.get("MERGE_WORKERS", 8))
+MERGE_CHUNK_ROWS = 100_000
+DUPLICATE_POLICIES = ('last', 'first', 'mean')
+
+
+def _date_sorted(chunk):
+    if 'date' not in chunk.columns:
+        raise ValueError("Every part needs a 'date' column to be merged.")
+    chunk = chunk[chunk['date'].notna()]
+    if not chunk['date'].is_monotonic_increasing:
+        chunk = chunk.sort_values('date', kind='stable')
+    return chunk
+
+
+def resolve_duplicates(block, duplicates=MERGE_DUPLICATES):
+    if duplicates not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy '{duplicates}', use one of {', '.join(DUPLICATE_POLICIES)}.")
+    if not block['date'].duplicated().any():
+        return block
+    if duplicates in ('last', 'first'):
+        return block.drop_duplicates('date', keep=duplicates)
+    numeric = [col for col in block.columns if col != 'date' and pd.api.types.is_numeric_dtype(block[col])]
+    agg = {col: 'mean' for col in numeric}
+    agg.update({col: 'last' for col in block.columns if col != 'date' and col not in agg})
+    return block.groupby('date', sort=False, observed=True).agg(agg).reset_index()
+
+
+# yields the merged log as date-ordered DataFrame blocks
+def merged_chunks(sources, chunk_rows=MERGE_CHUNK_ROWS, duplicates=MERGE_DUPLICATES):
+    parts = [read_health_log_chunks(source, chunk_rows) for source in sources]
+    pool = ThreadPoolExecutor(max_workers=max(1, min(len(parts), MERGE_WORKERS)))
+    try:
+        pending = {i: pool.submit(next, part, None) for i, part in enumerate(parts)}
+        buffers = {}
+        need = set(pending)
+        while True:
+            # refill every part whose buffer is empty or ends on the current
+            # threshold; it has to show its next rows before the merge can go on
+            for i in sorted(need):
+                while i in pending:
+                    chunk = pending.pop(i).result()
+                    if chunk is None:
+                        break
+                    pending[i] = pool.submit(next, parts[i], None)
+                    chunk = _date_sorted(chunk)
+                    if len(chunk):
+                        buffers[i] = _append(buffers.get(i), chunk)
+                        break
+            if not buffers:
+                return
+
+            live = [i for i in buffers if i in pending]
+            threshold = min(buffers[i]['date'].iloc[-1] for i in live) if live else None
+            ready = []
+            for i in sorted(buffers):
+                buf = buffers[i]
+                cut = len(buf) if threshold is None else buf['date'].searchsorted(threshold, side='left')
+                if cut:
+                    ready.append(buf.iloc[:cut])
+                if cut == len(buf):
+                    del buffers[i]
+                else:
+                    buffers[i] = buf.iloc[cut:]
+            need = {i for i in pending if i not in buffers or buffers[i]['date'].iloc[-1] == threshold}
+
+            if ready:
+                block = pd.concat(ready, ignore_index=True).sort_values('date', kind='stable')
+                block = resolve_duplicates(block, duplicates)
+                yield compact_health_log(block.reset_index(drop=True))
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _append(buf, chunk):
+    if buf is None:
+        return chunk
+    merged = pd.concat([buf, chunk])
+    if chunk['date'].iloc[0] < buf['date'].iloc[-1]:
+        merged = merged.sort_values('date', kind='stable')
+    return merged
+
+
+# the whole merged log as one frame; the blocks are already in order, so
+# this is a plain concat plus the date index
+def merge_health_logs(sources, chunk_rows=MERGE_CHUNK_ROWS, duplicates=MERGE_DUPLICATES):
+    blocks = list(merged_chunks(sources, chunk_rows, duplicates))
+    if not blocks:
+        return date_indexed(compact_health_log(pd.DataFrame(columns=['date'])))
+    df = compact_health_log(pd.concat(blocks, ignore_index=True))
+    if not df['date'].is_monotonic_increasing:
+        # only when a part went back in time across chunks
+        df = resolve_duplicates(df.sort_values('date', kind='stable'), duplicates).reset_index(drop=True)
+    return date_indexed(df)
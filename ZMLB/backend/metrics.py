@@ -0,0 +1,188 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# hot-path timings for the upload pipeline. code marks a stage with
+#   with stage('parse'):
+#       ...
+# which feeds a per-stage histogram (exported at /metrics in the prometheus
+# text format) and, while a request is being handled, that request's own
+# list of timings (sent back as the Server-Timing header). work done in the
+# job / render worker processes is timed there with timed_call and replayed
+# into this process with record_all, so it shows up in both places too.
+# the numbers are per process; with several api workers each one exports its
+# own and prometheus sums them
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_timings = contextvars.ContextVar('vita_timings', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        out = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            out.append(f'{name}_bucket{_labels(labels, le=le)} {cumulative}')
+        out.append(f'{name}_sum{_labels(labels)} {self.sum!r}')
+        out.append(f'{name}_count{_labels(labels)} {self.count}')
+        return out
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.requests = {}
+        self.request_seconds = {}
+        self.gauges = {}
+        self.started = time.time()
+
+    def observe_stage(self, name, seconds):
+        with self.lock:
+            hist = self.stages.get(name)
+            if hist is None:
+                hist = self.stages[name] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    def observe_request(self, route, method, status, seconds):
+        with self.lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            hist = self.request_seconds.get((route, method))
+            if hist is None:
+                hist = self.request_seconds[(route, method)] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    # one-off values such as startup timings; labels is a tuple of pairs
+    def set_gauge(self, name, value, help_text, labels=()):
+        with self.lock:
+            self.gauges[(name, tuple(labels))] = (help_text, value)
+
+    # prometheus text exposition format (version 0.0.4)
+    def render(self):
+        with self.lock:
+            lines = [
+                '# HELP vita_stage_seconds Time spent in each upload pipeline stage.',
+                '# TYPE vita_stage_seconds histogram',
+            ]
+            for name in sorted(self.stages):
+                lines += self.stages[name].lines('vita_stage_seconds', [('stage', name)])
+            lines += [
+                '# HELP vita_requests_total HTTP requests handled, by route, method and status.',
+                '# TYPE vita_requests_total counter',
+            ]
+            for (route, method, status), count in sorted(self.requests.items()):
+                labels = [('route', route), ('method', method), ('status', status)]
+                lines.append(f'vita_requests_total{_labels(labels)} {count}')
+            lines += [
+                '# HELP vita_request_seconds HTTP request latency, by route and method.',
+                '# TYPE vita_request_seconds histogram',
+            ]
+            for (route, method) in sorted(self.request_seconds):
+                lines += self.request_seconds[(route, method)].lines(
+                    'vita_request_seconds', [('route', route), ('method', method)])
+            lines += [
+                '# HELP vita_process_start_time_seconds Start time of this process since the epoch.',
+                '# TYPE vita_process_start_time_seconds gauge',
+                f'vita_process_start_time_seconds {self.started!r}',
+            ]
+            described = set()
+            for (name, labels), (help_text, value) in sorted(self.gauges.items()):
+                if name not in described:
+                    described.add(name)
+                    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+                lines.append(f'{name}{_labels(labels)} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def record(name, seconds):
+    metrics.observe_stage(name, seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def record_all(timings):
+    for name, seconds in timings:
+        record(name, seconds)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+# collects the stages timed inside the block (on this thread / context)
+@contextmanager
+def collect():
+    timings = []
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+# the same for code that can't wrap a with block around the work (flask's
+# before/after request hooks): pass the token to end_collect when done
+def begin_collect():
+    timings = []
+    return timings, _timings.set(timings)
+
+
+def end_collect(token):
+    _timings.reset(token)
+
+
+# for worker processes: fn(*args) plus the stages it timed, to hand back to
+# the parent's record_all
+def timed_call(fn, *args):
+    with collect() as timings:
+        result = fn(*args)
+    return result, timings
+
+
+# "parse;dur=12.3, fit;dur=40.1" with repeated stages summed, in first-seen order
+def server_timing(timings, total=None):
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in totals.items()]
+    if total is not None:
+        parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
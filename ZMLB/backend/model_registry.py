@@ -0,0 +1,106 @@
+import os
+import tempfile
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from ZMLB.backend.hybrid_insight_engine import FEATURES
+from ZMLB.backend.schema import MOOD_VOCABULARY
+from ZMLB.backend.locks import UserLock
+from ZMLB.backend.cache import MODEL_REGISTRY_DIR, model_path, model_revision
+
+# per-user mood models kept on local disk. each user gets an online logistic
+# model (SGD with log loss) that is updated with partial_fit, so an upload only
+# trains on days newer than the last one the model has seen. predictions for
+# known users come straight from the stored model
+
+# partial_fit needs every class up front, so the vocabulary is fixed. rows
+# with any other mood are left out of training
+MOOD_CLASSES = MOOD_VOCABULARY
+
+
+class OnlineMoodModel:
+    def __init__(self):
+        self.le = LabelEncoder().fit(MOOD_CLASSES)
+        self.scaler = StandardScaler()
+        self.model = SGDClassifier(loss='log_loss', random_state=0)
+        self.last_date = None
+        self.rows = 0
+
+    @property
+    def fitted(self):
+        return self.rows > 0
+
+    # rows dated after `since`; without dates everything counts as new
+    def new_rows(self, df, since):
+        if since is None or 'date' not in df.columns:
+            return df
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        return df[dates > since]
+
+    def partial_fit(self, df):
+        if 'mood' not in df.columns or any(col not in df.columns for col in FEATURES):
+            return 0
+        df = df[df['mood'].isin(self.le.classes_)].dropna(subset=FEATURES)
+        if len(df) == 0:
+            return 0
+        X = df[FEATURES].to_numpy(dtype=float)
+        y = self.le.transform(df['mood'])
+        self.scaler.partial_fit(X)
+        self.model.partial_fit(self.scaler.transform(X), y, classes=np.arange(len(self.le.classes_)))
+        self.rows += len(df)
+        if 'date' in df.columns:
+            newest = pd.to_datetime(df['date'], errors='coerce').max()
+            if not pd.isna(newest) and (self.last_date is None or newest > self.last_date):
+                self.last_date = newest
+        return len(df)
+
+    def predict(self, X):
+        return self.model.predict(self.scaler.transform(np.asarray(X, dtype=float)))
+
+
+class ModelRegistry:
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = root
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def _path(self, user_id):
+        return model_path(user_id, self.root)
+
+    # held around a load -> partial_fit -> save, across processes too
+    def user_lock(self, user_id):
+        with self.lock:
+            thread_lock = self.locks.setdefault(user_id, threading.Lock())
+        return UserLock(thread_lock, self._path(user_id)[:-len('.joblib')] + '.lock')
+
+    def load(self, user_id):
+        try:
+            return joblib.load(self._path(user_id))
+        except (OSError, EOFError, ValueError):
+            return OnlineMoodModel()
+
+    def save(self, user_id, model):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        os.close(fd)
+        joblib.dump(model, tmp)
+        os.replace(tmp, self._path(user_id))
+
+    # changes whenever the stored model does; part of the result cache key
+    # (api.py reads it with cache.model_revision, without importing this)
+    def revision(self, user_id):
+        return model_revision(user_id, self.root)
+
+    # train on the new days in df (if any) and return the user's model
+    def update(self, user_id, df):
+        with self.user_lock(user_id):
+            model = self.load(user_id)
+            if model.partial_fit(model.new_rows(df, model.last_date)):
+                self.save(user_id, model)
+            return model
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,82 @@
+import numpy as np
+
+# numpy-only inference for the linear mood models. a fitted model (sklearn
+# LogisticRegression / SGDClassifier, or the registry's OnlineMoodModel with
+# its scaler folded in) is exported to plain coef/intercept arrays, and
+# scoring is argmax(X @ coef.T + intercept) straight to integer mood codes,
+# with none of sklearn's per-call validation or dataframe conversion
+
+
+class MoodScorer:
+    def __init__(self, coef, intercept, classes):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.classes = np.asarray(classes)
+
+    def predict_codes(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return (X @ self.coef.T + self.intercept).argmax(axis=1)
+
+    def predict_labels(self, X):
+        return self.classes[self.predict_codes(X)]
+
+    def to_dict(self):
+        return {
+            "coef": self.coef.tolist(),
+            "intercept": self.intercept.tolist(),
+            "classes": self.classes.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["coef"], data["intercept"], data["classes"])
+
+
+def export_mood_model(model, le):
+    scaler = getattr(model, 'scaler', None)
+    estimator = getattr(model, 'model', model)
+    coef = np.asarray(estimator.coef_, dtype=np.float64)
+    intercept = np.asarray(estimator.intercept_, dtype=np.float64)
+
+    # binary models keep one row that scores the positive class; a zero row
+    # for the negative class makes argmax agree with sklearn's predict
+    if coef.shape[0] == 1:
+        coef = np.vstack([np.zeros_like(coef), coef])
+        intercept = np.concatenate([[0.0], intercept])
+
+    # (x - mean) / scale folded into the weights
+    if scaler is not None:
+        coef = coef / scaler.scale_
+        intercept = intercept - coef @ scaler.mean_
+
+    # estimator.classes_ are encoded ids, le maps them back to mood names
+    classes = le.inverse_transform(np.asarray(estimator.classes_))
+    return MoodScorer(coef, intercept, classes)
+
+
+# many users' models on one shared mood vocabulary: scoring a batch of rows
+# from different users is then one einsum over the stacked weights. classes a
+# user's model never learned get -inf so they can't win the argmax
+class StackedMoodScorer:
+    def __init__(self, scorers, vocabulary=None):
+        if vocabulary is None:
+            vocabulary = sorted(set().union(*(s.classes.tolist() for s in scorers)))
+        self.classes = np.asarray(vocabulary)
+        n_features = scorers[0].coef.shape[1]
+        self.coef = np.zeros((len(scorers), len(self.classes), n_features))
+        self.intercept = np.full((len(scorers), len(self.classes)), -np.inf)
+        position = {label: i for i, label in enumerate(self.classes.tolist())}
+        for u, scorer in enumerate(scorers):
+            idx = [position[label] for label in scorer.classes.tolist()]
+            self.coef[u, idx] = scorer.coef
+            self.intercept[u, idx] = scorer.intercept
+
+    # X: (rows, features), users: (rows,) index into the scorers list
+    def predict_codes(self, X, users):
+        X = np.asarray(X, dtype=np.float64)
+        users = np.asarray(users)
+        scores = np.einsum('nf,nkf->nk', X, self.coef[users]) + self.intercept[users]
+        return scores.argmax(axis=1)
+
+    def predict_labels(self, X, users):
+        return self.classes[self.predict_codes(X, users)]
@@ -0,0 +1,92 @@
+import os
+import base64
+import matplotlib
+matplotlib.use('Agg')  # worker processes import this module directly
+from ZMLB.backend.hybrid_insight_engine import HealthAnalysis, generate_combined_insights
+from ZMLB.backend.trends import trend_series, render_series_png, series_to_json
+from ZMLB.backend.streaming import CHUNK_ROWS, stream_insights
+from ZMLB.backend.model_registry import model_registry
+from ZMLB.backend.schema import read_health_log
+from ZMLB.backend.merge import merge_health_logs
+from ZMLB.backend.metrics import stage, timed_call
+
+# full upload -> response pipeline, shared by the sync route and the job workers.
+# cached results are keyed on cache.ENGINE_VERSION: bump it whenever insights
+# or the chart change for the same input
+
+
+# render(series, dpi) -> png bytes; the api passes render_pool.render to move
+# rasterization into the render workers. output='series' skips rendering and
+# returns the chart data as json arrays under "trend" instead of trend_image.
+# with a user_id the mood model comes from (and is updated in) the registry.
+# source can be a list of parts, which are merged into one log by date
+def analyze_csv(source, stream=False, chunk_rows=CHUNK_ROWS, render=render_series_png, output='png',
+                user_id=None):
+    if stream and user_id is not None:
+        with model_registry.user_lock(user_id):
+            online = model_registry.load(user_id)
+            rows_before = online.rows
+            insights, analysis = stream_insights(source, chunk_rows, online)
+            if online.rows != rows_before:
+                model_registry.save(user_id, online)
+    elif stream:
+        insights, analysis = stream_insights(source, chunk_rows)
+    else:
+        with stage('parse'):
+            if isinstance(source, (list, tuple)):
+                df = merge_health_logs(source)
+            else:
+                df = read_health_log(source)
+        insights, analysis = analyze_frame(df, user_id)
+    return build_response(insights, analysis, render, output)
+
+
+def analyze_frame(df, user_id=None):
+    model = le = None
+    if user_id is not None:
+        with stage('fit'):
+            online = model_registry.update(user_id, df)
+        if online.fitted:
+            model, le = online, online.le
+    analysis = HealthAnalysis(df, model, le)
+    insights = generate_combined_insights(df, analysis)
+    return insights, analysis
+
+
+def build_response(insights, analysis, render=render_series_png, output='png'):
+    series = trend_series(analysis.df, analysis)
+    if output == 'series':
+        return {
+            "insights": insights,
+            "trend": series_to_json(series)
+        }
+    png = render(series, 200)
+    with stage('base64'):
+        img_str = base64.b64encode(png).decode()
+    return {
+        "insights": insights,
+        "trend_image": img_str
+    }
+
+
+# job worker entry point: the result plus the stages timed in the worker,
+# which the parent replays into its own metrics
+def analyze_csv_file_timed(path, stream=False, chunk_rows=CHUNK_ROWS, output='png', user_id=None):
+    return timed_call(analyze_csv_file, path, stream, chunk_rows, output, user_id)
+
+
+# job workers get a temp file path (or a list of them for a multi-part
+# upload) instead of the bytes so big uploads are not pickled across the
+# process boundary. the files are removed when done
+def analyze_csv_file(path, stream=False, chunk_rows=CHUNK_ROWS, output='png', user_id=None):
+    paths = path if isinstance(path, (list, tuple)) else [path]
+    files = []
+    try:
+        files = [open(p, 'rb') for p in paths]
+        source = files if isinstance(path, (list, tuple)) else files[0]
+        return analyze_csv(source, stream, chunk_rows, output=output, user_id=user_id)
+    finally:
+        for f in files:
+            f.close()
+        for p in paths:
+            os.remove(p)
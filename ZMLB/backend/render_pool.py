@@ -0,0 +1,94 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ZMLB.backend.metrics import record_all, timed_call
+
+# chart rasterization off the request threads: a pool of render processes
+# that already have matplotlib, the ggplot style and the font cache loaded.
+# the api sends the trend series (numpy arrays) and gets png bytes back.
+# RENDER_WORKERS=0 (default) keeps rendering inline in the request thread
+
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", 0))
+RENDER_TIMEOUT_SECONDS = int(os.environ.get("RENDER_TIMEOUT_SECONDS", 60))
+
+
+# runs once in every render process (and in the api process on preload):
+# pulls in matplotlib and draws a throwaway figure so the style, fonts and
+# text layout caches are hot before the first request
+def warm_renderer():
+    import matplotlib
+    matplotlib.use('Agg')
+    from ZMLB.backend.trends import figure_to_png, use_style
+    from matplotlib.figure import Figure
+    use_style()
+    fig = Figure(figsize=(2, 2))
+    ax = fig.add_subplot()
+    ax.plot([0, 1], [0, 1], marker='o', label='warm')
+    ax.text(0.5, 0.5, 'warm', fontsize=9)
+    ax.legend()
+    figure_to_png(fig, dpi=50)
+
+
+def _render(series, dpi):
+    from ZMLB.backend.trends import render_series_png
+    return render_series_png(series, dpi)
+
+
+def _noop():
+    return os.getpid()
+
+
+class RenderPool:
+    def __init__(self, workers=RENDER_WORKERS, timeout=RENDER_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.pool = None
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=warm_renderer,
+                )
+            return self.pool
+
+    # start every worker up front instead of on the first few requests
+    def warm(self):
+        if not self.enabled:
+            return
+        pool = self._get_pool()
+        for future in [pool.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+
+    # the worker's render/savefig timings are replayed here so they land in
+    # this process's metrics and the request's Server-Timing header
+    def render(self, series, dpi=200):
+        pool = self._get_pool()
+        try:
+            future = pool.submit(timed_call, _render, series, dpi)
+        except BrokenProcessPool:
+            with self.lock:
+                if self.pool is pool:
+                    self.pool = None
+            future = self._get_pool().submit(timed_call, _render, series, dpi)
+        png, timings = future.result(timeout=self.timeout)
+        record_all(timings)
+        return png
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=wait)
+                self.pool = None
+
+
+render_pool = RenderPool()
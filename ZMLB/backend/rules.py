@@ -0,0 +1,377 @@
+import numpy as np
+import pandas as pd
+from ZMLB.backend.streaks import COMPARATORS, StreakCounter, dated_rows, row_breaks, run_stats
+
+# declarative insight rules. each rule names a metric column, a comparator and
+# threshold for "bad" days, how to aggregate them, and message tiers checked
+# in order (first match wins, None = otherwise). compile_rules turns a list
+# of rules into one evaluation: all metric columns go into a single matrix,
+# every comparison runs as one vectorized op per comparator, and one
+# run-length pass yields every streak, so adding a rule adds a column to the
+# pass instead of another pass over the data
+#
+# aggregations: current_streak, longest_streak, count, mean, min, max, last
+# tier messages are format strings with {value}; "cast" converts the value
+# before tiers are checked. "window_days": N limits a rule to the trailing
+# N days of the log (after the latest date minus N), so e.g. a count or a
+# streak reads "in the last two weeks" instead of "ever"
+
+DEFAULT_RULES = [
+    {
+        "name": "hydration",
+        "metric": "hydration_ml",
+        "comparator": "<",
+        "threshold": 2200,
+        "aggregation": "current_streak",
+        "missing": "⚠️ 'hydration_ml' column missing. Hydration analysis skipped.",
+        "tiers": [
+            (">=", 5, "🚱 You've been underhydrated for 5 days straight! Your body needs more fluids urgently."),
+            (">=", 4, "⚠️ You've had 4 days of low water intake. Time to focus on staying hydrated!"),
+            (">=", 3, "🚰 Your hydration has been low for 3 or more days. Increase water intake."),
+            (">=", 2, "💧 You’ve had low hydration for 2 days. Try to drink more water today."),
+            (">=", 1, "🫗 Yesterday’s water intake was low. Stay hydrated today!"),
+        ],
+    },
+    {
+        "name": "sleep",
+        "metric": "sleep_hours",
+        "comparator": "<",
+        "threshold": 6,
+        "aggregation": "current_streak",
+        "missing": "⚠️ 'sleep_hours' column missing. Sleep analysis skipped.",
+        "tiers": [
+            (">=", 5, "🛌 You've been sleep-deprived for 5 days in a row! Prioritize proper rest to recover."),
+            (">=", 4, "⚠️ Four days of poor sleep detected. Make time for rest before it impacts your health."),
+            (">=", 3, "😴 Your sleep has been below 6 hours for multiple days. Aim for 7–8 hours of rest."),
+            (">=", 2, "⏰ Two days of low sleep logged. Try to wind down earlier tonight."),
+            (">=", 1, "🫣 You didn’t get enough sleep yesterday. Rest well tonight!"),
+        ],
+    },
+    {
+        "name": "steps",
+        "metric": "steps",
+        "aggregation": "mean",
+        "cast": int,
+        "missing": "⚠️ 'steps' column missing. Steps analysis skipped.",
+        "tiers": [
+            ("<", 3000, "🛑 Your average steps ({value}) are very low. Try taking short walks throughout the day to stay active."),
+            ("<", 5000, "🚶‍♂️ Your average steps ({value}) are lower than the healthy range. Try to stay more active."),
+            ("<", 8000, "🚶‍♀️ You're getting some movement with {value} steps daily. A little more effort can put you in the optimal range!"),
+            ("<", 10000, "👏 Great job! You're averaging {value} steps. Keep going to hit the ideal target!"),
+            (None, None, "🏃‍♂️ Fantastic! {value} steps a day puts you in top shape. Stay consistent!"),
+        ],
+    },
+]
+
+def tier_message(rule, value):
+    if value is None or pd.isna(value):
+        return None
+    if rule.get("cast") is not None:
+        value = rule["cast"](value)
+    for comparator, bound, message in rule["tiers"]:
+        if comparator is None or COMPARATORS[comparator](value, bound):
+            return message.format(value=value)
+    return None
+
+
+class RuleSet:
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.by_name = {rule["name"]: rule for rule in self.rules}
+        self.metrics = list(dict.fromkeys(rule["metric"] for rule in self.rules))
+        self.metric_index = np.array([self.metrics.index(rule["metric"]) for rule in self.rules])
+        self.thresholds = np.array([rule.get("threshold", np.nan) for rule in self.rules], dtype=np.float64)
+        self.comparators = [rule.get("comparator") for rule in self.rules]
+        # {window_days: [rule names]} for the windowed rules
+        self.windows = {}
+        for rule in self.rules:
+            if rule.get("window_days") is not None:
+                self.windows.setdefault(rule["window_days"], []).append(rule["name"])
+
+    def _masks(self, X, thresholds):
+        # one op per comparator over every rule that uses it; thresholds is
+        # (rules,) or (rows, rules) for per-row (per-user) thresholds
+        masks = np.zeros((X.shape[0], len(self.rules)), dtype=bool)
+        values = X[:, self.metric_index]
+        thresholds = np.broadcast_to(thresholds, values.shape)
+        with np.errstate(invalid='ignore'):
+            for op in set(c for c in self.comparators if c is not None):
+                cols = np.array([c == op for c in self.comparators])
+                masks[:, cols] = COMPARATORS[op](values[:, cols], thresholds[:, cols])
+        return masks
+
+    def _matrix(self, df):
+        present = [m in df.columns for m in self.metrics]
+        X = np.full((len(df), len(self.metrics)), np.nan)
+        for j, metric in enumerate(self.metrics):
+            if present[j]:
+                X[:, j] = df[metric].to_numpy(dtype=np.float64, na_value=np.nan)
+        return X, present
+
+    # {rule name: aggregated value} (None where the metric column is missing).
+    # windowed rules are read again from each window's trailing rows
+    def values(self, df, thresholds=None):
+        df = dated_rows(df)
+        results = self._values(df, thresholds)
+        for days, names in self.windows.items():
+            recent = self._values(_window(df, days), thresholds)
+            results.update((name, recent[name]) for name in names)
+        return results
+
+    def _values(self, df, thresholds):
+        X, present = self._matrix(df)
+        thresholds = self.thresholds if thresholds is None else thresholds
+        masks = self._masks(X, thresholds)
+        _, current, longest, count = run_stats(masks, row_breaks(len(df), df.get('date')))
+        results = {}
+        for j, rule in enumerate(self.rules):
+            col = self.metric_index[j]
+            if not present[col]:
+                results[rule["name"]] = None
+                continue
+            results[rule["name"]] = self._aggregate(rule["aggregation"], X[:, col],
+                                                    current[j], longest[j], count[j])
+        return results
+
+    def _aggregate(self, aggregation, column, current, longest, count):
+        if aggregation == 'current_streak':
+            return int(current)
+        if aggregation == 'longest_streak':
+            return int(longest)
+        if aggregation == 'count':
+            return int(count)
+        if len(column) == 0 or np.isnan(column).all():
+            return None
+        if aggregation == 'mean':
+            return float(np.nanmean(column))
+        if aggregation == 'min':
+            return float(np.nanmin(column))
+        if aggregation == 'max':
+            return float(np.nanmax(column))
+        if aggregation == 'last':
+            return float(column[~np.isnan(column)][-1])
+        raise ValueError(f"Unknown aggregation '{aggregation}'")
+
+    def messages(self, df, thresholds=None):
+        return self.tier_messages(self.values(df, thresholds), df.columns)
+
+    # the message for every rule's value, or its "missing" note when the
+    # metric isn't among columns
+    def tier_messages(self, values, columns):
+        insights = []
+        for rule in self.rules:
+            value = values[rule["name"]]
+            if value is None and rule["metric"] not in columns:
+                msg = rule.get("missing")
+            else:
+                msg = tier_message(rule, value)
+            if msg:
+                insights.append(msg)
+        return insights
+
+    # many users in one long frame: rows are grouped by user_col, thresholds
+    # is an optional DataFrame (index = user, columns = rule names) overriding
+    # the rule defaults per user. returns a DataFrame of aggregated values,
+    # one row per user, from a single pass over all rows (plus one over each
+    # window's rows for windowed rules)
+    def values_by_user(self, df, user_col='user_id', thresholds=None):
+        if 'date' in df.columns and pd.api.types.is_datetime64_any_dtype(df['date']) and df['date'].hasnans:
+            df = df[df['date'].notna()]
+        values = self._values_by_user(df, user_col, thresholds)
+        for days, names in self.windows.items():
+            recent = self._values_by_user(_user_window(df, user_col, days), user_col, thresholds)
+            values[names] = recent[names].reindex(values.index)
+        return values
+
+    def _values_by_user(self, df, user_col, thresholds):
+        df = df.sort_values([user_col, 'date'] if 'date' in df.columns else [user_col], kind='stable')
+        users, user_codes = np.unique(df[user_col].to_numpy(), return_inverse=True)
+        X, present = self._matrix(df)
+
+        table = np.tile(self.thresholds, (len(users), 1))
+        if thresholds is not None:
+            overrides = thresholds.reindex(index=users, columns=[r["name"] for r in self.rules])
+            table = np.where(overrides.isna().to_numpy(), table, overrides.to_numpy(dtype=np.float64))
+        masks = self._masks(X, table[user_codes])
+
+        n = len(df)
+        seg_start = np.r_[True, user_codes[1:] != user_codes[:-1]] if n else np.zeros(0, dtype=bool)
+        breaks = row_breaks(n, df.get('date')) | seg_start
+        starts = np.flatnonzero(seg_start)
+        ends = np.r_[starts[1:], n] - 1
+
+        current, longest, count = segment_run_stats(masks, breaks, starts, ends)
+        out = {}
+        for j, rule in enumerate(self.rules):
+            col = self.metric_index[j]
+            agg = rule["aggregation"]
+            if not present[col]:
+                out[rule["name"]] = np.full(len(users), np.nan)
+            elif agg == 'current_streak':
+                out[rule["name"]] = current[:, j]
+            elif agg == 'longest_streak':
+                out[rule["name"]] = longest[:, j]
+            elif agg == 'count':
+                out[rule["name"]] = count[:, j]
+            else:
+                out[rule["name"]] = _segment_reduce(agg, X[:, col], starts, ends)
+        return pd.DataFrame(out, index=pd.Index(users, name=user_col))
+
+    def messages_by_user(self, df, user_col='user_id', thresholds=None):
+        values = self.values_by_user(df, user_col, thresholds)
+        return {
+            user: [msg for msg in (tier_message(rule, row[rule["name"]]) for rule in self.rules) if msg]
+            for user, row in values.iterrows()
+        }
+
+
+# the trailing rows of a date-ordered log that a windowed rule reads: the
+# days after the latest date minus days, or the last days rows when the log
+# has no dates. rows are sorted, so the cut is one searchsorted
+def _window(df, days):
+    if len(df) == 0:
+        return df
+    if 'date' not in df.columns or not pd.api.types.is_datetime64_any_dtype(df['date']):
+        return df.iloc[-days:]
+    dates = df['date'].to_numpy()
+    cutoff = dates[-1] - np.timedelta64(days, 'D')
+    return df.iloc[np.searchsorted(dates, cutoff, side='right'):]
+
+
+# _window for every user of a long frame, each against their own latest date
+def _user_window(df, user_col, days):
+    if 'date' not in df.columns or not pd.api.types.is_datetime64_any_dtype(df['date']):
+        return df[df.groupby(user_col, sort=False).cumcount(ascending=False) < days]
+    latest = df.groupby(user_col, sort=False)['date'].transform('max')
+    return df[df['date'] > latest - pd.Timedelta(days=days)]
+
+
+# run stats per (segment, column): segments are row ranges [starts, ends]
+def segment_run_stats(masks, breaks, starts, ends):
+    n, k = masks.shape
+    segs = len(starts)
+    if n == 0 or k == 0:
+        zeros = np.zeros((segs, k), dtype=np.int64)
+        return zeros, zeros, zeros
+    change = np.empty((n, k), dtype=bool)
+    change[0] = True
+    change[1:] = masks[1:] != masks[:-1]
+    change |= breaks[:, None]
+
+    flat_change = change.ravel(order='F')
+    run_id = np.cumsum(flat_change) - 1
+    lengths = np.bincount(run_id)
+    run_starts = np.flatnonzero(flat_change)
+    run_value = masks.ravel(order='F')[run_starts]
+    run_col = run_starts // n
+    run_seg = np.searchsorted(starts, run_starts % n, side='right') - 1
+
+    longest = np.zeros((segs, k), dtype=np.int64)
+    np.maximum.at(longest, (run_seg[run_value], run_col[run_value]), lengths[run_value])
+
+    last = ends[:, None] + np.arange(k)[None, :] * n
+    current = np.where(masks[ends], lengths[run_id[last]], 0)
+    count = np.add.reduceat(masks.astype(np.int64), starts, axis=0)
+    return current, longest, count
+
+
+def _segment_reduce(aggregation, column, starts, ends):
+    valid = ~np.isnan(column)
+    sums = np.add.reduceat(np.where(valid, column, 0.0), starts)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if aggregation == 'mean':
+            return np.where(counts > 0, sums / counts, np.nan)
+        if aggregation == 'min':
+            return np.fmin.reduceat(column, starts)
+        if aggregation == 'max':
+            return np.fmax.reduceat(column, starts)
+        if aggregation == 'last':
+            return pd.Series(column).groupby(np.repeat(np.arange(len(starts)), ends - starts + 1)).last().to_numpy()
+    raise ValueError(f"Unknown aggregation '{aggregation}'")
+
+
+# RuleSet.values built up chunk by chunk for the streaming reader: the
+# streaks go through a StreakCounter, the other aggregations are running
+# totals per metric. windowed rules can't be totalled as rows go by, since
+# days drop out of the window, so the rows of the widest window are kept
+# (tail) and read with RuleSet.values at the end. thresholds is (rules,)
+# like RuleSet.values takes
+class RuleAccumulator:
+    def __init__(self, ruleset, thresholds=None):
+        self.ruleset = ruleset
+        self.thresholds = ruleset.thresholds if thresholds is None else thresholds
+        self.columns = None
+        k = len(ruleset.metrics)
+        self.streaks = StreakCounter(len(ruleset.rules))
+        self.total = np.zeros(k)
+        self.count = np.zeros(k, dtype=np.int64)
+        self.low = np.full(k, np.inf)
+        self.high = np.full(k, -np.inf)
+        self.last = np.full(k, np.nan)
+        self.window_days = max(ruleset.windows) if ruleset.windows else None
+        self.tail = None
+
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        chunk = dated_rows(chunk)
+        if len(chunk) == 0:
+            return
+        dates = chunk.get('date')
+        latest = self.streaks.is_latest(dates)
+        X, _ = self.ruleset._matrix(chunk)
+        self.streaks.update(self.ruleset._masks(X, self.thresholds), dates)
+        if self.window_days is not None:
+            tail = chunk if self.tail is None else pd.concat([self.tail, chunk])
+            self.tail = _window(dated_rows(tail), self.window_days)
+
+        valid = ~np.isnan(X)
+        self.total += np.where(valid, X, 0.0).sum(axis=0)
+        self.count += valid.sum(axis=0)
+        self.low = np.fmin(self.low, np.fmin.reduce(X, axis=0))
+        self.high = np.fmax(self.high, np.fmax.reduce(X, axis=0))
+        if latest:
+            seen = valid.any(axis=0)
+            last_row = len(X) - 1 - np.argmax(valid[::-1], axis=0)
+            self.last = np.where(seen, X[last_row, np.arange(X.shape[1])], self.last)
+
+    def values(self):
+        columns = self.columns or []
+        streaks = self.streaks
+        results = {}
+        for j, rule in enumerate(self.ruleset.rules):
+            col = self.ruleset.metric_index[j]
+            aggregation = rule["aggregation"]
+            if rule["metric"] not in columns:
+                results[rule["name"]] = None
+            elif aggregation == 'current_streak':
+                results[rule["name"]] = int(streaks.current[j])
+            elif aggregation == 'longest_streak':
+                results[rule["name"]] = int(streaks.longest[j])
+            elif aggregation == 'count':
+                results[rule["name"]] = int(streaks.count[j])
+            elif aggregation not in ('mean', 'min', 'max', 'last'):
+                raise ValueError(f"Unknown aggregation '{aggregation}'")
+            elif not self.count[col]:
+                results[rule["name"]] = None
+            elif aggregation == 'mean':
+                results[rule["name"]] = float(self.total[col] / self.count[col])
+            else:
+                value = {'min': self.low, 'max': self.high, 'last': self.last}[aggregation][col]
+                results[rule["name"]] = float(value)
+        if self.tail is not None:
+            recent = self.ruleset.values(self.tail, self.thresholds)
+            for names in self.ruleset.windows.values():
+                results.update((name, recent[name]) for name in names)
+        return results
+
+    def messages(self):
+        return self.ruleset.tier_messages(self.values(), self.columns or [])
+
+
+def compile_rules(rules=DEFAULT_RULES):
+    return RuleSet(rules)
+
+
+default_rules = compile_rules()
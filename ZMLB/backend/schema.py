@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+from ZMLB.backend.sniff import column_renames
+from ZMLB.backend.formats import read_frame, read_frame_chunks, source_format
+
+# compact in-memory layout for health logs, shared by every loader:
+#   date         -> datetime64 (also the row index, see date_indexed)
+#   sleep_hours  -> float32
+#   steps        -> int32   (float32 if the column has gaps)
+#   hydration_ml -> uint16  (float32 if the column has gaps or is out of range)
+#   mood         -> category with the known vocabulary first, so codes are
+#                   stable across files; unknown moods are appended, not lost
+
+MOOD_VOCABULARY = ['angry', 'excited', 'happy', 'neutral', 'okay', 'sad', 'tired']
+
+NUMERIC_DTYPES = {
+    'sleep_hours': np.float32,
+    'steps': np.int32,
+    'hydration_ml': np.uint16,
+}
+
+# numbers are parsed as float32 first so a missing value never fails the read.
+# dates are read as a category so the csv parser hands over each distinct day
+# once (a multi-user log repeats them) and only those get parsed
+READ_DTYPES = {
+    'date': 'category',
+    'sleep_hours': np.float32,
+    'steps': np.float32,
+    'hydration_ml': np.float32,
+    'mood': 'category',
+}
+
+
+def _downcast(values, dtype):
+    if np.issubdtype(dtype, np.floating):
+        return values.astype(dtype)
+    info = np.iinfo(dtype)
+    if values.isna().any() or values.min() < info.min or values.max() > info.max:
+        return values
+    if not (values == np.floor(values)).all():
+        return values
+    return values.astype(dtype)
+
+
+def mood_categories(moods):
+    extra = sorted(set(moods.cat.categories) - set(MOOD_VOCABULARY))
+    return moods.cat.set_categories(MOOD_VOCABULARY + extra)
+
+
+# exports write plain days; anything else (timestamps, offsets) falls back
+# to the general ISO 8601 parser
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _parse_date_strings(values):
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    missed = parsed.isna() & values.notna()
+    if missed.any():
+        parsed[missed] = pd.to_datetime(values[missed], format='ISO8601', errors='coerce')
+    return parsed
+
+
+def parse_dates(dates):
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    if isinstance(dates.dtype, pd.CategoricalDtype):
+        days = _parse_date_strings(pd.Series(dates.cat.categories.astype(object)))
+        # code -1 (missing) picks the NaT appended at the end
+        lookup = np.append(days.to_numpy(), np.datetime64('NaT'))
+        return pd.Series(lookup[dates.cat.codes.to_numpy()], index=dates.index, name=dates.name)
+    return _parse_date_strings(dates)
+
+
+# rows in date order with a DatetimeIndex over them, built once at ingest so
+# every consumer gets ordered dates and range slicing (df.loc['2025-04']).
+# exports are already in order, so the sort is only paid when they're not.
+# rows without a date are kept, after the dated ones (pandas only range
+# slices an index that has none). the index stays unnamed, since a level
+# called 'date' would make every sort_values / groupby on the column ambiguous
+def date_indexed(df):
+    if 'date' not in df.columns or not pd.api.types.is_datetime64_any_dtype(df['date']):
+        return df
+    if not df['date'].is_monotonic_increasing:
+        df = df.sort_values('date', kind='stable')
+    return df.set_axis(pd.DatetimeIndex(df['date'].to_numpy()), axis=0)
+
+
+def compact_health_log(df):
+    # 'Sleep Hours', 'water_ml', ... -> the canonical names (sniff.py)
+    renames = column_renames(df.columns)
+    if renames:
+        df = df.rename(columns=renames)
+    for col, dtype in NUMERIC_DTYPES.items():
+        if col in df.columns:
+            df[col] = _downcast(pd.to_numeric(df[col], errors='coerce').astype(np.float32), dtype)
+    if 'mood' in df.columns:
+        if not isinstance(df['mood'].dtype, pd.CategoricalDtype):
+            df['mood'] = df['mood'].astype('category')
+        df['mood'] = mood_categories(df['mood'])
+    if 'date' in df.columns:
+        df['date'] = parse_dates(df['date'])
+    return df
+
+
+# csv, or parquet / arrow / ndjson by their first bytes (formats.py)
+def read_health_log(source, **kwargs):
+    fmt = source_format(source)
+    if fmt != 'csv':
+        return date_indexed(compact_health_log(read_frame(source, fmt)))
+    return date_indexed(compact_health_log(pd.read_csv(source, dtype=READ_DTYPES, **kwargs)))
+
+
+def read_health_log_chunks(source, chunk_rows):
+    fmt = source_format(source)
+    if fmt != 'csv':
+        chunks = read_frame_chunks(source, fmt, chunk_rows)
+    else:
+        chunks = pd.read_csv(source, dtype=READ_DTYPES, chunksize=chunk_rows)
+    for chunk in chunks:
+        yield compact_health_log(chunk)
@@ -0,0 +1,131 @@
+import os
+import gc
+import sys
+
+# production entry point: python -m ZMLB.backend.serve
+#
+# gunicorn master + WEB_CONCURRENCY pre-forked workers, each with
+# WORKER_THREADS request threads. with PRELOAD=eager (the default here) the
+# app and the engine modules (pandas, sklearn, matplotlib, warmed renderer)
+# are loaded once in the master before forking and gc.freeze() moves them
+# out of the collector's reach, so the workers share those pages
+# copy-on-write instead of importing them each. PRELOAD=background preloads
+# in every worker after the fork instead, lazy leaves it to first use.
+#
+# recycling caps the slow growth of matplotlib / pandas caches: a worker is
+# replaced after WORKER_MAX_REQUESTS requests (+ up to
+# WORKER_MAX_REQUESTS_JITTER so they don't all restart together) or as soon
+# as a request leaves it above WORKER_MAX_MEMORY_MB resident (shared
+# copy-on-write pages included, so set it above the master's size). SIGTERM
+# stops accepting connections and gives in-flight requests
+# GRACEFUL_TIMEOUT_SECONDS to finish.
+#
+# async jobs and their results live in the worker that accepted them, so
+# with more than one worker /jobs/<id> polling needs sticky sessions (or
+# WEB_CONCURRENCY=1). without gunicorn (e.g. on windows) this falls back to
+# flask's threaded server with a warning
+
+PORT = int(os.environ.get("PORT", 10000))
+HOST = os.environ.get("HOST", "0.0.0.0")
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", min(4, os.cpu_count() or 1)))
+WORKER_THREADS = int(os.environ.get("WORKER_THREADS", 4))
+WORKER_MAX_REQUESTS = int(os.environ.get("WORKER_MAX_REQUESTS", 1000))
+WORKER_MAX_REQUESTS_JITTER = int(os.environ.get("WORKER_MAX_REQUESTS_JITTER", 100))
+WORKER_MAX_MEMORY_MB = int(os.environ.get("WORKER_MAX_MEMORY_MB", 0))
+WORKER_TIMEOUT_SECONDS = int(os.environ.get("WORKER_TIMEOUT_SECONDS", 120))
+GRACEFUL_TIMEOUT_SECONDS = int(os.environ.get("GRACEFUL_TIMEOUT_SECONDS", 30))
+
+
+# current resident set size; /proc on linux, peak rss elsewhere
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def preload_mode():
+    from ZMLB.backend import startup
+    return startup.preload_mode(default='eager')
+
+
+def load_app():
+    from ZMLB.backend import startup
+    # a background preload thread in the master would be lost in the fork;
+    # post_worker_init starts one per worker instead
+    startup.start('eager' if preload_mode() == 'eager' else 'lazy')
+    from ZMLB.backend.api import app
+    gc.freeze()
+    return app
+
+
+# gunicorn server hooks
+def post_worker_init(worker):
+    from ZMLB.backend import startup
+    from ZMLB.backend.render_pool import render_pool
+    if preload_mode() == 'background':
+        startup.start_background()
+    render_pool.warm()
+
+
+def post_request(worker, req, environ, resp):
+    if WORKER_MAX_MEMORY_MB and rss_mb() > WORKER_MAX_MEMORY_MB:
+        worker.log.info("worker %s at %.0f MB (limit %d MB), recycling", worker.pid, rss_mb(), WORKER_MAX_MEMORY_MB)
+        worker.alive = False
+
+
+def worker_exit(server, worker):
+    # only the pools this worker actually started; importing jobs here
+    # would load the whole engine just to shut it down
+    for module, name in (('ZMLB.backend.jobs', 'job_queue'), ('ZMLB.backend.render_pool', 'render_pool')):
+        if module in sys.modules:
+            getattr(sys.modules[module], name).shutdown(wait=False)
+
+
+def options():
+    return {
+        'bind': f'{HOST}:{PORT}',
+        'workers': WEB_CONCURRENCY,
+        'threads': WORKER_THREADS,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'max_requests': WORKER_MAX_REQUESTS,
+        'max_requests_jitter': WORKER_MAX_REQUESTS_JITTER,
+        'timeout': WORKER_TIMEOUT_SECONDS,
+        'graceful_timeout': GRACEFUL_TIMEOUT_SECONDS,
+        'post_worker_init': post_worker_init,
+        'post_request': post_request,
+        'worker_exit': worker_exit,
+        'accesslog': '-',
+    }
+
+
+def main():
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("⚠️ gunicorn not installed, falling back to the single-process flask server")
+        app = load_app()
+        if preload_mode() == 'background':
+            from ZMLB.backend import startup
+            startup.start_background()
+        app.run(host=HOST, port=PORT, threaded=True)
+        return 0
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options().items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app()
+
+    Server().run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
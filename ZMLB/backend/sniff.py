@@ -0,0 +1,255 @@
+import os
+import re
+import csv
+import json
+
+# upload checks that only look at the first bytes of a file: the header and
+# a few rows are checked against the expected columns before pandas, sklearn
+# or matplotlib are touched, so a wrong file gets a 4xx in well under a
+# millisecond instead of a 500 from deep inside training. stdlib only, the
+# api imports this at load time.
+#
+# headers are matched case-insensitively with spaces / dashes read as
+# underscores, and the common export spellings in COLUMN_ALIASES are mapped
+# to the canonical names (schema.py renames them the same way on read).
+# a column that is present but has no usable value in any sampled row (a
+# different date format, text in a number column) is rejected too; single
+# blanks or typos further down are left to the parser, which coerces them.
+#
+# the format comes from the first bytes, never the file name: parquet
+# (PAR1), arrow ipc file (ARROW1) or stream (continuation marker), ndjson
+# (a line starting with '{') and csv otherwise. parquet / arrow headers are
+# read from their schema by formats.py, which needs pyarrow
+
+SNIFF_BYTES = int(os.environ.get("SNIFF_BYTES", 64 * 1024))
+SNIFF_ROWS = int(os.environ.get("SNIFF_ROWS", 5))
+
+UPLOAD_COLUMNS = ('date', 'sleep_hours', 'steps', 'hydration_ml', 'mood')
+NUMERIC_COLUMNS = ('sleep_hours', 'steps', 'hydration_ml')
+
+COLUMN_ALIASES = {
+    'day': 'date',
+    'timestamp': 'date',
+    'sleep': 'sleep_hours',
+    'sleep_hrs': 'sleep_hours',
+    'hours_slept': 'sleep_hours',
+    'sleep_duration': 'sleep_hours',
+    'step': 'steps',
+    'step_count': 'steps',
+    'steps_count': 'steps',
+    'hydration': 'hydration_ml',
+    'water': 'hydration_ml',
+    'water_ml': 'hydration_ml',
+    'water_intake_ml': 'hydration_ml',
+    'feeling': 'mood',
+    'mood_label': 'mood',
+}
+
+DATE_PATTERN = re.compile(r'\d{4}-\d{1,2}-\d{1,2}')
+
+PARQUET_MAGIC = b'PAR1'
+ARROW_FILE_MAGIC = b'ARROW1'
+ARROW_STREAM_MAGIC = b'\xff\xff\xff\xff'
+UTF8_BOM = b'\xef\xbb\xbf'
+
+
+class UploadRejected(ValueError):
+    def __init__(self, status, code, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.details = details or {}
+
+    def to_dict(self):
+        return {"error": str(self), "code": self.code, "details": self.details}
+
+
+def normalize_name(name):
+    return re.sub(r'[\s\-]+', '_', name.strip().lower())
+
+
+def canonical_name(name):
+    key = normalize_name(name)
+    return COLUMN_ALIASES.get(key, key)
+
+
+# {header as written: canonical name} for every column that needs a rename
+def column_renames(columns):
+    renames = {}
+    for name in columns:
+        if not isinstance(name, str):
+            continue
+        canonical = canonical_name(name)
+        if canonical != name and canonical in UPLOAD_COLUMNS:
+            renames[name] = canonical
+    return renames
+
+
+def _is_number(value):
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+# decompressing streams may return short reads, so read until size or eof
+def _head(fileobj, size):
+    start = fileobj.tell()
+    data = b''
+    while len(data) < size:
+        block = fileobj.read(size - len(data))
+        if not block:
+            break
+        data += block
+    fileobj.seek(start)
+    return data
+
+
+def _lines(data, complete):
+    if b'\0' in data:
+        raise UploadRejected(415, 'not_text', "The file is not a text CSV.")
+    if not complete:
+        # the read stopped mid-file; drop the partial last line so a cut
+        # multi-byte character isn't reported as bad encoding
+        cut = data.rfind(b'\n')
+        if cut < 0:
+            raise UploadRejected(422, 'header_too_long',
+                                 f"No line break in the first {len(data)} bytes.")
+        data = data[:cut]
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        raise UploadRejected(415, 'bad_encoding', "The file must be UTF-8 encoded.",
+                             {"byte_offset": e.start})
+    return text.splitlines()
+
+
+def detect_format(fileobj):
+    head = _head(fileobj, 64)
+    if head.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    if head.startswith(ARROW_FILE_MAGIC):
+        return 'arrow'
+    if head.startswith(ARROW_STREAM_MAGIC):
+        return 'arrow_stream'
+    text = head[len(UTF8_BOM):] if head.startswith(UTF8_BOM) else head
+    if text.lstrip().startswith(b'{'):
+        return 'ndjson'
+    return 'csv'
+
+
+# checks one upload of any format (see sniff_csv)
+def sniff_upload(fileobj, required=UPLOAD_COLUMNS):
+    fmt = detect_format(fileobj)
+    if fmt == 'csv':
+        return sniff_csv(fileobj, required)
+    if fmt == 'ndjson':
+        return sniff_ndjson(fileobj, required)
+    from ZMLB.backend.formats import columnar_header
+    header, rows = columnar_header(fileobj, fmt)
+    canonical, _ = check_columns(header, required)
+    if rows == 0:
+        raise UploadRejected(422, 'no_rows', "The file has a schema but no rows.")
+    return {"columns": canonical, "renames": column_renames(header), "format": fmt}
+
+
+# checks one upload (a seekable binary stream, left where it was) and returns
+# {'columns': [...canonical...], 'renames': {...}, 'sampled_rows': n}.
+# raises UploadRejected with the http status and a machine-readable code
+def sniff_csv(fileobj, required=UPLOAD_COLUMNS, sample_rows=SNIFF_ROWS, size=SNIFF_BYTES):
+    data = _head(fileobj, size + 1)
+    complete = len(data) <= size
+    # blank lines are skipped, as the parser does
+    lines = [line for line in _lines(data[:size], complete) if line.strip()]
+    rows = list(csv.reader(lines[:sample_rows + 1]))
+    if not rows or not any(field.strip() for field in rows[0]):
+        raise UploadRejected(422, 'empty_file', "The file has no header row.")
+
+    header = rows[0]
+    canonical, seen = check_columns(header, required)
+    check_sample(header, seen, rows[1:], required)
+    return {
+        "columns": canonical,
+        "renames": column_renames(header),
+        "sampled_rows": len(rows) - 1,
+    }
+
+
+# header names -> (canonical names, {canonical: position}); raises on
+# duplicate or missing required columns
+def check_columns(header, required=UPLOAD_COLUMNS):
+    canonical = [canonical_name(name) for name in header]
+    seen = {}
+    for position, name in enumerate(canonical):
+        if name in required and name in seen:
+            raise UploadRejected(422, 'duplicate_columns',
+                                 f"Column '{name}' appears more than once.",
+                                 {"column": name, "headers": [header[seen[name]], header[position]]})
+        seen.setdefault(name, position)
+
+    missing = [name for name in required if name not in seen]
+    if missing:
+        details = {"missing": missing, "found": header, "expected": list(UPLOAD_COLUMNS)}
+        if len(header) == 1 and (';' in header[0] or '\t' in header[0]):
+            details["hint"] = "Columns must be separated by commas."
+        raise UploadRejected(422, 'missing_columns',
+                             f"Missing required column(s): {', '.join(missing)}.", details)
+    return canonical, seen
+
+
+# the first rows as lists of strings in header order
+def check_sample(header, seen, sample, required=UPLOAD_COLUMNS):
+    if not sample:
+        raise UploadRejected(422, 'no_rows', "The file has a header but no data rows.")
+    for number, row in enumerate(sample, start=1):
+        if len(row) > len(header):
+            raise UploadRejected(422, 'ragged_row',
+                                 f"Row {number} has {len(row)} fields, the header has {len(header)}.",
+                                 {"row": number})
+
+    for name in required:
+        values = [row[seen[name]].strip() for row in sample if seen[name] < len(row)]
+        values = [value for value in values if value]
+        if not values:
+            continue
+        if name == 'date':
+            usable = any(DATE_PATTERN.match(value) for value in values)
+        elif name in NUMERIC_COLUMNS:
+            usable = any(_is_number(value) for value in values)
+        else:
+            usable = True
+        if not usable:
+            expected = 'YYYY-MM-DD dates' if name == 'date' else 'numbers'
+            raise UploadRejected(422, 'bad_values',
+                                 f"Column '{header[seen[name]]}' should hold {expected}.",
+                                 {"column": name, "sample": values[:3]})
+
+
+# one json object per line; the header is every key seen in the sampled
+# records, in first-seen order
+def sniff_ndjson(fileobj, required=UPLOAD_COLUMNS, sample_rows=SNIFF_ROWS, size=SNIFF_BYTES):
+    data = _head(fileobj, size + 1)
+    lines = [line for line in _lines(data[:size], len(data) <= size) if line.strip()]
+    records = []
+    for number, line in enumerate(lines[:sample_rows], start=1):
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise UploadRejected(422, 'bad_json', f"Record {number} is not valid JSON.",
+                                 {"row": number, "detail": str(e)})
+        if not isinstance(record, dict):
+            raise UploadRejected(422, 'bad_json', f"Record {number} is not a JSON object.", {"row": number})
+        records.append(record)
+
+    header = list(dict.fromkeys(key for record in records for key in record))
+    canonical, seen = check_columns(header, required)
+    sample = [['' if record.get(key) is None else str(record.get(key)) for key in header]
+              for record in records]
+    check_sample(header, seen, sample, required)
+    return {
+        "columns": canonical,
+        "renames": column_renames(header),
+        "sampled_rows": len(records),
+        "format": 'ndjson',
+    }
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+import threading
+from ZMLB.backend.metrics import metrics
+
+# cold start handling. api.py only imports flask and the small helper
+# modules at load time; pandas, sklearn and matplotlib come in with the
+# engine modules below. PRELOAD picks when that happens:
+#   eager      -> before the server starts listening (slowest start, no
+#                 first-request penalty; what pre-forked workers want)
+#   background -> in a thread right after startup, so the port opens at once
+#                 and the first upload only waits for whatever is still loading
+#   lazy       -> on first use
+# unset, serve.py uses eager (its pre-forked workers share what the master
+# loaded) and everything else background: importing api.py (gunicorn
+# ZMLB.backend.api:app, flask run) starts it. a thread started before a
+# fork doesn't carry over, so serve.py runs background preloading in each
+# worker, and gunicorn --preload on api:app wants PRELOAD=eager.
+# import and first-request times are exported at /metrics and checked
+# against COLD_START_TARGET_MS.
+#
+# at image build time run
+#   python -m ZMLB.backend.startup --build-cache
+# to build matplotlib's font cache (into MPLCONFIGDIR) and byte-compile the
+# package, so a fresh instance doesn't pay for either.
+# python -m ZMLB.backend.startup --report prints the import costs
+
+PROCESS_STARTED = time.perf_counter()
+
+PRELOAD = os.environ.get("PRELOAD", "")
+PRELOAD_MODES = ('eager', 'background', 'lazy')
+COLD_START_TARGET_MS = int(os.environ.get("COLD_START_TARGET_MS", 1500))
+
+PRELOAD_MODULES = [
+    'ZMLB.backend.pipeline',
+    'ZMLB.backend.model_registry',
+    'ZMLB.backend.history_store',
+    'ZMLB.backend.jobs',
+]
+
+import_seconds = {}
+preloaded = threading.Event()
+_first_request = threading.Lock()
+_first_request_seen = False
+_start_lock = threading.Lock()
+_started = False
+
+
+# imports the engine modules in order, timing each; a module's time only
+# covers what the ones before it hadn't already pulled in
+def preload(modules=PRELOAD_MODULES, warm=True):
+    start = time.perf_counter()
+    for name in modules:
+        if name in sys.modules:
+            continue
+        t = time.perf_counter()
+        importlib.import_module(name)
+        import_seconds[name] = time.perf_counter() - t
+        metrics.set_gauge('vita_import_seconds', import_seconds[name],
+                          'Time to import each engine module at startup.', (('module', name),))
+    if warm:
+        from ZMLB.backend.render_pool import warm_renderer
+        t = time.perf_counter()
+        warm_renderer()
+        import_seconds['warm_renderer'] = time.perf_counter() - t
+    metrics.set_gauge('vita_preload_seconds', time.perf_counter() - start,
+                      'Time spent preloading engine modules.')
+    preloaded.set()
+    return import_seconds
+
+
+def preload_mode(default='background'):
+    mode = PRELOAD or default
+    if mode not in PRELOAD_MODES:
+        raise ValueError(f"PRELOAD must be eager, background or lazy, not '{mode}'")
+    return mode
+
+
+def start_background():
+    threading.Thread(target=preload, name='vita-preload', daemon=True).start()
+
+
+# once per process; the first caller's mode wins, so serve.py can pick one
+# before api.py's own start() runs at import
+def start(mode=None):
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    mode = mode or preload_mode()
+    if mode == 'eager':
+        preload()
+    elif mode == 'background':
+        start_background()
+
+
+# called after every response; the first one records time-to-first-request
+def request_served():
+    global _first_request_seen
+    if _first_request_seen:
+        return
+    with _first_request:
+        if _first_request_seen:
+            return
+        _first_request_seen = True
+    elapsed = time.perf_counter() - PROCESS_STARTED
+    metrics.set_gauge('vita_first_request_seconds', elapsed,
+                      'Time from process start to the first response.')
+    if elapsed * 1000 > COLD_START_TARGET_MS:
+        print(f"⏱️ first request served {elapsed * 1000:.0f} ms after start "
+              f"(target {COLD_START_TARGET_MS} ms)")
+
+
+def build_cache():
+    import compileall
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.font_manager
+    from ZMLB.backend.render_pool import warm_renderer
+    warm_renderer()
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    compileall.compile_dir(package, quiet=1)
+    print(f"matplotlib cache in {matplotlib.get_cachedir()}, bytecode compiled under {package}")
+
+
+# the cold start of an eager process, step by step. the report does its own
+# preload, so api.py's start() at import is told not to begin another one in
+# the background (that would race it for the import lock and skew the
+# times). run with python -m this file is __main__, and api.py imports a
+# second copy of it, so that's the copy that has to be started lazy. the
+# exit status says whether the total made COLD_START_TARGET_MS
+def report():
+    importlib.import_module('ZMLB.backend.startup').start('lazy')
+    t = time.perf_counter()
+    importlib.import_module('ZMLB.backend.api')
+    api_seconds = time.perf_counter() - t
+    preload()
+    total = time.perf_counter() - PROCESS_STARTED
+    print(f"{'ZMLB.backend.api':<32} {api_seconds * 1000:9.1f} ms")
+    for name, seconds in import_seconds.items():
+        print(f"{name:<32} {seconds * 1000:9.1f} ms")
+    print(f"{'total':<32} {total * 1000:9.1f} ms (target {COLD_START_TARGET_MS} ms)")
+    return 0 if total * 1000 <= COLD_START_TARGET_MS else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold start helpers for the backend.")
+    parser.add_argument('--build-cache', action='store_true', help="build the font cache and bytecode")
+    parser.add_argument('--report', action='store_true', help="print import times")
+    args = parser.parse_args(argv)
+    if args.build_cache:
+        build_cache()
+    if args.report:
+        return report()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
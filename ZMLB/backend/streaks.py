@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+# run-length streaks for the rule checks (rules.py). every rule's comparison
+# over the rows is an (n_rows, n_rules) mask, and one run-length pass over
+# that mask gives, per rule:
+#   current -> length of the run ending on the latest day (0 if that day is fine)
+#   longest -> longest run anywhere in the log
+#   count   -> total matching days
+# a gap of more than one day between rows breaks a run, so "5 days straight"
+# really means five consecutive calendar days. rows without a date can't be
+# placed in a run and are left out (see dated_rows)
+
+COMPARATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+}
+
+MAX_GAP = pd.Timedelta(days=1)
+
+
+# True where a row can't continue the previous row's run: the first row
+# (unless continues, i.e. it follows on from an earlier chunk) and any row
+# whose date jumped by more than MAX_GAP or went back in time
+def row_breaks(n, dates=None, previous=None, continues=False):
+    breaks = np.zeros(n, dtype=bool)
+    if n == 0:
+        return breaks
+    breaks[0] = not continues
+    if dates is None or not pd.api.types.is_datetime64_any_dtype(dates):
+        return breaks
+    values = np.asarray(dates, dtype='datetime64[ns]')
+    gap = np.timedelta64(MAX_GAP)
+    step = np.diff(values)
+    breaks[1:] = (step > gap) | (step < np.timedelta64(0))
+    if continues and previous is not None and not pd.isna(previous):
+        step = values[0] - np.datetime64(previous, 'ns')
+        breaks[0] = step > gap or step < np.timedelta64(0)
+    return breaks
+
+
+# runs of every column in one pass: flatten column-major so each column's rows
+# are contiguous, start a new run wherever the value flips or a break is set,
+# and let bincount measure them. returns per column (first_run, current,
+# longest, count) where first_run is the length of a leading True run
+def run_stats(masks, breaks):
+    n, k = masks.shape
+    zeros = np.zeros(k, dtype=np.int64)
+    if n == 0 or k == 0:
+        return zeros, zeros, zeros, zeros
+
+    change = np.empty((n, k), dtype=bool)
+    change[0] = True
+    change[1:] = masks[1:] != masks[:-1]
+    change[1:] |= breaks[1:, None]
+
+    flat_change = change.ravel(order='F')
+    flat_mask = masks.ravel(order='F')
+    run_id = np.cumsum(flat_change) - 1
+    lengths = np.bincount(run_id)
+    starts = np.flatnonzero(flat_change)
+    run_value = flat_mask[starts]
+    run_col = starts // n
+
+    longest = np.zeros(k, dtype=np.int64)
+    np.maximum.at(longest, run_col[run_value], lengths[run_value])
+
+    first_ids = run_id[np.arange(k) * n]
+    last_ids = run_id[np.arange(k) * n + n - 1]
+    first_run = np.where(masks[0], lengths[first_ids], 0)
+    current = np.where(masks[-1], lengths[last_ids], 0)
+    count = masks.sum(axis=0)
+    return first_run, current, longest, count
+
+
+# the rows a streak can be read from: dated ones, in date order. schema.py
+# keeps undated rows at the end of a log, where they would pass for the
+# latest day
+def dated_rows(df):
+    if 'date' not in df.columns or not pd.api.types.is_datetime64_any_dtype(df['date']):
+        return df
+    if df['date'].hasnans:
+        df = df[df['date'].notna()]
+    if df['date'].is_monotonic_increasing:
+        return df
+    return df.sort_values('date', kind='stable')
+
+
+# the run numbers of run_stats built up chunk by chunk for the streaming
+# reader, from the masks of rows already in date order (dated_rows). a run
+# that crosses a chunk boundary is stitched together from the previous
+# chunk's current run and this chunk's first run. a chunk that starts before
+# the latest day seen so far can't be placed without the whole log, so the
+# step back breaks the run, and a chunk that ends before it leaves current
+# alone since the latest day is still the one seen earlier
+class StreakCounter:
+    def __init__(self, k):
+        self.current = np.zeros(k, dtype=np.int64)
+        self.longest = np.zeros(k, dtype=np.int64)
+        self.count = np.zeros(k, dtype=np.int64)
+        self.last_date = None
+        self.started = False
+
+    # False when dates end before the latest day seen so far
+    def is_latest(self, dates):
+        return dates is None or self.last_date is None or not dates.iloc[-1] < self.last_date
+
+    def update(self, masks, dates=None):
+        if len(masks) == 0:
+            return
+        breaks = row_breaks(len(masks), dates, self.last_date, continues=self.started)
+        first_run, current, longest, count = run_stats(masks, breaks)
+        latest = self.is_latest(dates)
+
+        joined = np.where(breaks[0], first_run, self.current + first_run)
+        whole = first_run == len(masks)
+        self.longest = np.maximum.reduce([self.longest, longest, joined])
+        if latest:
+            self.current = np.where(whole, joined, current)
+        self.count = self.count + count
+        if dates is not None and latest:
+            self.last_date = dates.iloc[-1]
+        self.started = True
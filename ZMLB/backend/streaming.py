@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from ZMLB.backend.hybrid_insight_engine import FEATURES, HealthAnalysis, train_mood_model, mood_message
+from ZMLB.backend.mood_scoring import export_mood_model
+from ZMLB.backend.schema import read_health_log_chunks
+from ZMLB.backend.rules import RuleAccumulator, default_rules
+from ZMLB.backend.merge import merged_chunks
+from ZMLB.backend.metrics import stage
+
+# streaming ingestion for big uploads: the csv is read in chunks and every
+# check keeps only running totals, so memory does not grow with the row count.
+# pass 1 -> rule counters (rules.RuleAccumulator, the same rules and
+#           thresholds as the full path) + a bounded sample for fitting the mood model + a
+#           decimated series for the trend chart
+# pass 2 -> predict mood chunk by chunk with the fitted model, count sad days
+
+CHUNK_ROWS = 100_000
+SAMPLE_ROWS = 50_000   # rows kept for fitting the mood model
+PLOT_ROWS = 2_000      # rows kept for the trend chart
+
+
+class InsightAccumulator:
+    def __init__(self, rules=default_rules, thresholds=None, sample_rows=SAMPLE_ROWS, plot_rows=PLOT_ROWS,
+                 seed=0):
+        self.sample_rows = sample_rows
+        self.plot_rows = plot_rows
+        self.rng = np.random.default_rng(seed)
+        self.columns = None
+        self.rows = 0
+        self.rules = RuleAccumulator(rules, thresholds)
+        self.sad_days = 0
+        self.sample = None
+        self.plot = None
+        self.plot_stride = 1
+
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+
+        self.rules.update(chunk)
+        self._update_sample(chunk)
+        self._update_plot(chunk)
+        self.rows += len(chunk)
+
+    # bottom-k sampling: every row gets a random key and the smallest keys win,
+    # which is a uniform sample of everything seen so far
+    def _update_sample(self, chunk):
+        keyed = chunk.assign(_key=self.rng.random(len(chunk)))
+        if self.sample is not None:
+            keyed = pd.concat([self.sample, keyed], ignore_index=True)
+        if len(keyed) > self.sample_rows:
+            keyed = keyed.nsmallest(self.sample_rows, '_key')
+        self.sample = keyed
+
+    # keep every plot_stride-th row, doubling the stride whenever the buffer
+    # fills up so the chart always covers the whole upload
+    def _update_plot(self, chunk):
+        positions = np.arange(self.rows, self.rows + len(chunk))
+        kept = chunk[positions % self.plot_stride == 0].assign(_pos=positions[positions % self.plot_stride == 0])
+        if self.plot is not None:
+            kept = pd.concat([self.plot, kept], ignore_index=True)
+        while len(kept) > self.plot_rows:
+            self.plot_stride *= 2
+            kept = kept[kept['_pos'] % self.plot_stride == 0]
+        self.plot = kept
+
+    def fit_mood_model(self):
+        if self.sample is None or len(self.sample) == 0:
+            return None, None
+        return train_mood_model(self.sample.drop(columns='_key').reset_index(drop=True))
+
+    def update_mood(self, chunk, scorer):
+        if scorer is None or len(chunk) == 0 or any(col not in chunk.columns for col in FEATURES):
+            return
+        X = chunk[FEATURES].to_numpy(dtype='float64')
+        predicted = scorer.predict_labels(X[~np.isnan(X).any(axis=1)])
+        self.sad_days += int((predicted == 'sad').sum())
+
+    def plot_frame(self):
+        if self.plot is None:
+            return pd.DataFrame(columns=self.columns or [])
+        return self.plot.drop(columns='_pos').reset_index(drop=True)
+
+    def insights(self, model, le):
+        insights = self.rules.messages()
+        if model is None or le is None:
+            insights.append("⚠️ Mood prediction skipped due to missing required columns.")
+        else:
+            insights.append(mood_message(self.sad_days))
+
+        return [msg for msg in insights if msg]
+
+
+def read_chunks(source, chunk_rows=CHUNK_ROWS):
+    return read_health_log_chunks(source, chunk_rows)
+
+
+# source must be seekable (werkzeug spools uploads to a temp file), the
+# second pass re-reads it instead of keeping the rows around. a list of
+# sources is read as one log through the k-way merge (merge.py). the returned
+# HealthAnalysis wraps the decimated chart rows and the model fitted here.
+# with a registry model (online) each chunk's new days go to partial_fit and
+# that model is used instead of one fitted on the sample. rules is a compiled
+# RuleSet, as for generate_combined_insights
+def stream_insights(source, chunk_rows=CHUNK_ROWS, online=None, rules=default_rules):
+    acc = InsightAccumulator(rules)
+    sources = list(source) if isinstance(source, (list, tuple)) else [source]
+    starts = [s.tell() for s in sources]
+    since = online.last_date if online is not None else None
+
+    def chunks():
+        for s, start in zip(sources, starts):
+            s.seek(start)
+        if len(sources) == 1:
+            return read_chunks(sources[0], chunk_rows)
+        return merged_chunks(sources, chunk_rows)
+
+    # pass 1 (reading + every running total) is reported as parse; online
+    # partial_fit happens inside it
+    with stage('parse'):
+        for chunk in chunks():
+            acc.update(chunk)
+            if online is not None:
+                online.partial_fit(online.new_rows(chunk, since))
+
+    if online is not None and online.fitted:
+        model, le = online, online.le
+    else:
+        with stage('fit'):
+            model, le = acc.fit_mood_model()
+
+    if model is not None:
+        scorer = export_mood_model(model, le)
+        with stage('predict'):
+            for chunk in chunks():
+                acc.update_mood(chunk, scorer)
+
+    with stage('rules'):
+        insights = acc.insights(model, le)
+    return insights, HealthAnalysis(acc.plot_frame(), model, le)
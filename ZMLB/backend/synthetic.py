@@ -0,0 +1,359 @@
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from ZMLB.backend.schema import MOOD_VOCABULARY
+
+# synthetic health logs with the same columns and value ranges as the
+# ZML-CSV samples (date, sleep_hours, steps, hydration_ml, mood), for
+# benchmarks and load tests:
+#   python -m ZMLB.backend.synthetic --users 1000 --days 3650 -o logs.csv
+#   python -m ZMLB.backend.synthetic --users 50 --days 90 --split 3 -o custom_health_log_hydration_split.csv
+#   python -m ZMLB.backend.synthetic --rows 10M -o - | curl -F file=@-;filename=log.csv ...
+#
+# every user has their own baseline and a day-to-day "wellness" level that
+# drifts as an AR(1) process; sleep, steps and hydration all follow it, so
+# they are correlated, and mood is drawn from the full vocabulary with odds
+# that shift with it (sad/tired/angry on bad stretches, happy/excited on good
+# ones). gap_rate drops days, duplicate_rate logs some days twice with a
+# second reading. rows come out in (user, date) order, or with
+# order='date' in (date, user) order like a combined export, generated a
+# block at a time so memory stays flat for any size
+
+START_DATE = '2025-03-18'
+# datetime64[ns] only reaches 2262, so a single user's log longer than this
+# wraps back to the start date, as if several logs had been concatenated
+SPAN_DAYS = 36_500
+COLUMNS = ['date', 'sleep_hours', 'steps', 'hydration_ml', 'mood']
+BLOCK_ROWS = int(os.environ.get("SYNTHETIC_BLOCK_ROWS", 1_000_000))
+
+SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+# sleep is logged to one decimal; "0.0" .. "24.0" indexed by tenths
+SLEEP_LABELS = [f'{tenths / 10:.1f}' for tenths in range(241)]
+
+WELLNESS_PERSISTENCE = 0.8
+# how strongly each mood follows the wellness level, in MOOD_VOCABULARY order
+MOOD_LOADINGS = np.array([-0.9, 1.1, 1.2, 0.0, 0.4, -1.3, -0.8])
+MOOD_BIAS = np.array([-1.2, -0.6, 0.2, 0.3, 0.3, -0.4, 0.0])
+
+
+# "30", "10k", "1.5M" -> row counts
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1:] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def _user_baselines(rng, users):
+    return {
+        'sleep': rng.normal(7.0, 0.5, users),
+        'steps': np.clip(rng.normal(8500, 2200, users), 2500, 16000),
+        'hydration': np.clip(rng.normal(2200, 300, users), 1400, 3200),
+    }
+
+
+# wellness for a (users, days) window, continuing each user's AR(1) from
+# `state` (the previous window's last day)
+def _wellness(rng, state, days):
+    phi = WELLNESS_PERSISTENCE
+    noise = rng.normal(0.0, np.sqrt(1 - phi ** 2), (len(state), days))
+    return ar1(noise, state, phi)
+
+
+# x[t] = phi * x[t-1] + noise[t] along axis 1, x[-1] = start. solved
+# AR1_BLOCK days at a time: inside a block it's one matmul with the
+# lower-triangular matrix of phi powers, and only the carried-in level
+# needs a python-level step per block
+AR1_BLOCK = 128
+
+
+def ar1(noise, start, phi, block=AR1_BLOCK):
+    users, days = noise.shape
+    if days == 0:
+        return noise.copy()
+    width = min(block, days)
+    blocks = -(-days // width)
+    steps = np.zeros((users, blocks * width), dtype=np.float64)
+    steps[:, :days] = noise
+    steps = steps.reshape(users, blocks, width)
+    lag = np.arange(width)[:, None] - np.arange(width)[None, :]
+    powers = np.where(lag >= 0, phi ** np.maximum(lag, 0), 0.0)
+    within = steps @ powers.T
+    decay = phi ** np.arange(1, width + 1)
+    carry = np.asarray(start, dtype=np.float64)
+    for b in range(blocks):
+        within[:, b] += carry[:, None] * decay
+        carry = within[:, b, -1]
+    return within.reshape(users, -1)[:, :days]
+
+
+# mood odds are a softmax over the vocabulary that shifts with wellness.
+# wellness is bucketed into MOOD_BINS levels with the cumulative odds of each
+# precomputed; bucket b's cdf is stored offset by b, so one searchsorted of
+# b + uniform draws every row's mood at once
+MOOD_BINS = 64
+WELLNESS_RANGE = 4.0
+
+
+def _mood_cdf():
+    levels = np.linspace(-WELLNESS_RANGE, WELLNESS_RANGE, MOOD_BINS)
+    logits = levels[:, None] * MOOD_LOADINGS + MOOD_BIAS
+    odds = np.exp(logits - logits.max(axis=1, keepdims=True))
+    cdf = np.cumsum(odds / odds.sum(axis=1, keepdims=True), axis=1)
+    cdf[:, -1] = 1.0
+    return (cdf + np.arange(MOOD_BINS)[:, None]).ravel()
+
+
+MOOD_CDF = _mood_cdf()
+
+
+def _moods(rng, wellness):
+    scale = (MOOD_BINS - 1) / (2 * WELLNESS_RANGE)
+    bins = np.clip(np.rint((wellness + WELLNESS_RANGE) * scale), 0, MOOD_BINS - 1).astype(np.int64)
+    draws = np.searchsorted(MOOD_CDF, bins + rng.random(len(bins)), side='right')
+    return np.minimum(draws - bins * len(MOOD_VOCABULARY), len(MOOD_VOCABULARY) - 1).astype(np.int8)
+
+
+def _block(rng, base, users, first_day, wellness, gap_rate, duplicate_rate, order='user'):
+    n_users, days = wellness.shape
+    if order == 'date':
+        user_idx = np.tile(np.arange(n_users), days)
+        day = np.repeat(np.arange(first_day, first_day + days), n_users)
+        w = wellness.T.ravel()
+    else:
+        user_idx = np.repeat(np.arange(n_users), days)
+        day = np.tile(np.arange(first_day, first_day + days), n_users)
+        w = wellness.ravel()
+
+    keep = rng.random(len(w)) >= gap_rate if gap_rate else slice(None)
+    user_idx, day, w = user_idx[keep], day[keep], w[keep]
+    if duplicate_rate:
+        repeats = 1 + (rng.random(len(w)) < duplicate_rate)
+        user_idx, day, w = np.repeat(user_idx, repeats), np.repeat(day, repeats), np.repeat(w, repeats)
+
+    noise = rng.standard_normal((3, len(w)), dtype=np.float32)
+    sleep = base['sleep'][user_idx] + 0.8 * w + 0.6 * noise[0]
+    steps = base['steps'][user_idx] * (1 + 0.2 * w) + 1500 * noise[1]
+    hydration = (base['hydration'][user_idx] + 250 * w
+                 + 0.04 * (steps - base['steps'][user_idx]) + 280 * noise[2])
+    return {
+        'user': users[user_idx],
+        'day': day % SPAN_DAYS,
+        'sleep_hours': np.round(np.clip(sleep, 2.5, 11.0), 1),
+        'steps': np.clip(steps, 300, 30000).astype(np.int32),
+        'hydration_ml': np.clip(hydration, 500, 5000).astype(np.int32),
+        'mood': _moods(rng, w),
+    }
+
+
+# yields dicts of numpy arrays (user, day offset, the four metrics, mood
+# codes), about block_rows rows each, in (user, date) order; order='date'
+# walks the days instead, every user's next window at a time
+def health_log_blocks(users=1, days=365, seed=0, gap_rate=0.0, duplicate_rate=0.0, block_rows=BLOCK_ROWS,
+                      order='user'):
+    rng = np.random.default_rng(seed)
+    user_ids = np.arange(users)
+    base = _user_baselines(rng, users)
+    if order == 'date':
+        state = rng.normal(0.0, 1.0, users)
+        window = max(1, min(days, block_rows // max(users, 1)))
+        for first_day in range(0, days, window):
+            wellness = _wellness(rng, state, min(window, days - first_day))
+            state = wellness[:, -1]
+            yield _block(rng, base, user_ids, first_day, wellness, gap_rate, duplicate_rate, order)
+        return
+    group = max(1, block_rows // max(days, 1))
+    window = max(1, min(days, block_rows))
+    for first_user in range(0, users, group):
+        members = user_ids[first_user:first_user + group]
+        group_base = {k: v[members] for k, v in base.items()}
+        state = rng.normal(0.0, 1.0, len(members))
+        for first_day in range(0, days, window):
+            wellness = _wellness(rng, state, min(window, days - first_day))
+            state = wellness[:, -1]
+            yield _block(rng, group_base, members, first_day, wellness, gap_rate, duplicate_rate)
+
+
+EMPTY_BLOCK = {
+    'user': np.zeros(0, dtype=np.int64),
+    'day': np.zeros(0, dtype=np.int64),
+    'sleep_hours': np.zeros(0),
+    'steps': np.zeros(0, dtype=np.int32),
+    'hydration_ml': np.zeros(0, dtype=np.int32),
+    'mood': np.zeros(0, dtype=np.int8),
+}
+
+
+def block_frame(block, start=START_DATE, user_column=False):
+    df = pd.DataFrame({
+        'date': (np.datetime64(start, 'D') + block['day']).astype('datetime64[ns]'),
+        'sleep_hours': block['sleep_hours'],
+        'steps': block['steps'],
+        'hydration_ml': block['hydration_ml'],
+        'mood': pd.Categorical.from_codes(block['mood'], MOOD_VOCABULARY),
+    }, columns=COLUMNS)
+    if user_column:
+        df.insert(0, 'user_id', _user_labels(block['user']))
+    return df
+
+
+def _user_labels(users):
+    return np.char.add('user_', users.astype(str))
+
+
+# one user's log of `rows` days as a DataFrame
+def health_log(rows, seed=0, start=START_DATE):
+    frames = [block_frame(b, start) for b in health_log_blocks(1, rows, seed)]
+    if not frames:
+        return block_frame(EMPTY_BLOCK, start)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _pyarrow_csv():
+    try:
+        import pyarrow
+        import pyarrow.csv
+    except ImportError:
+        return None
+    return pyarrow
+
+
+# csv bytes for one block: dates as YYYY-MM-DD like the samples. with
+# pyarrow, every text column (dates, sleep to one decimal, mood, user) is a
+# take() from a small table of pre-formatted labels, which writes several
+# times faster than formatting each value; DataFrame.to_csv is the fallback
+def block_csv(block, start=START_DATE, user_column=False, pa=None):
+    if pa is None:
+        df = block_frame(block, start, user_column)
+        return df.to_csv(index=False, header=False, date_format='%Y-%m-%d').encode()
+    first = int(block['day'].min()) if len(block['day']) else 0
+    last = int(block['day'].max()) if len(block['day']) else 0
+    dates = pa.array(np.datetime_as_string(np.datetime64(start, 'D') + np.arange(first, last + 1), unit='D'))
+    columns = {
+        'date': dates.take(pa.array(block['day'] - first)),
+        'sleep_hours': pa.array(SLEEP_LABELS).take(pa.array(np.rint(block['sleep_hours'] * 10).astype(np.int16))),
+        'steps': block['steps'],
+        'hydration_ml': block['hydration_ml'],
+        'mood': pa.array(MOOD_VOCABULARY).take(pa.array(block['mood'])),
+    }
+    if user_column:
+        users, codes = np.unique(block['user'], return_inverse=True)
+        columns = {'user_id': pa.array(_user_labels(users)).take(pa.array(codes)), **columns}
+    buf = pa.BufferOutputStream()
+    pa.csv.write_csv(pa.table(columns), buf, pa.csv.WriteOptions(include_header=False, quoting_style='none'))
+    return buf.getvalue().to_pybytes()
+
+
+def csv_header(user_column=False):
+    return (','.join((['user_id'] if user_column else []) + COLUMNS) + '\n').encode()
+
+
+# stream a generated log as csv to a binary file object; returns rows written
+def write_health_log(out, users=1, days=365, seed=0, gap_rate=0.0, duplicate_rate=0.0,
+                     user_column=None, start=START_DATE, block_rows=BLOCK_ROWS, order='user'):
+    user_column = users > 1 if user_column is None else user_column
+    pa = _pyarrow_csv()
+    out.write(csv_header(user_column))
+    rows = 0
+    for block in health_log_blocks(users, days, seed, gap_rate, duplicate_rate, block_rows, order):
+        out.write(block_csv(block, start, user_column, pa))
+        rows += len(block['day'])
+    return rows
+
+
+# split series like ZML-CSV/custom_health_log_hydration_split*.csv: the days
+# are cut into `parts` consecutive ranges, written as <stem>.csv,
+# <stem>_2.csv, ... every file holding every user's days in its range
+def split_paths(path, parts):
+    stem, ext = os.path.splitext(path)
+    return [path] + [f'{stem}_{i}{ext or ".csv"}' for i in range(2, parts + 1)]
+
+
+def write_split_health_logs(path, parts, users=1, days=365, seed=0, gap_rate=0.0, duplicate_rate=0.0,
+                            user_column=None, start=START_DATE, block_rows=BLOCK_ROWS, order='user'):
+    user_column = users > 1 if user_column is None else user_column
+    pa = _pyarrow_csv()
+    paths = split_paths(path, parts)
+    bounds = np.linspace(0, days, parts + 1).astype(int)
+    files = [open(p, 'wb') for p in paths]
+    try:
+        for f in files:
+            f.write(csv_header(user_column))
+        for block in health_log_blocks(users, days, seed, gap_rate, duplicate_rate, block_rows, order):
+            part = np.searchsorted(bounds, block['day'], side='right') - 1
+            for i in np.unique(part):
+                rows = part == i
+                files[i].write(block_csv({k: v[rows] for k, v in block.items()}, start, user_column, pa))
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+# writes a log of about `rows` rows as csv and returns the path; existing
+# files are reused since big ones take a while to write. up to
+# REALISTIC_SPAN_DAYS rows it's one user's log; past that it's
+# rows // REALISTIC_SPAN_DAYS users with about that many days each, in
+# (date, user) order, so dates stay in order and each user's days are real
+# consecutive days instead of one log wrapping around SPAN_DAYS
+REALISTIC_SPAN_DAYS = 3650
+
+
+def health_log_csv(rows, seed=0, directory=None):
+    directory = directory or tempfile.gettempdir()
+    users = max(1, rows // REALISTIC_SPAN_DAYS)
+    days = -(-rows // users)
+    path = os.path.join(directory, f'vita-synthetic-{rows}-{seed}-{users}u.csv')
+    if not os.path.exists(path):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            write_health_log(f, users, days, seed, order='date')
+        os.replace(tmp, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic health logs as CSV.")
+    parser.add_argument('-o', '--output', default='-', help="output path, '-' for stdout")
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--days', type=int, default=365, help="days per user")
+    parser.add_argument('--rows', help="total rows instead of --days, e.g. 10M (split evenly over --users)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--gap-rate', type=float, default=0.0, help="fraction of days left out")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help="fraction of days logged twice")
+    parser.add_argument('--split', type=int, default=1, help="write N files of consecutive date ranges")
+    parser.add_argument('--user-column', choices=['auto', 'yes', 'no'], default='auto')
+    parser.add_argument('--order', choices=['user', 'date'], default='user',
+                        help="rows grouped by user, or by date across users")
+    parser.add_argument('--start', default=START_DATE)
+    args = parser.parse_args(argv)
+
+    days = args.days
+    if args.rows:
+        days = max(1, -(-parse_size(args.rows) // args.users))
+    user_column = {'auto': None, 'yes': True, 'no': False}[args.user_column]
+    options = dict(users=args.users, days=days, seed=args.seed, gap_rate=args.gap_rate,
+                   duplicate_rate=args.duplicate_rate, user_column=user_column, start=args.start,
+                   order=args.order)
+
+    if args.split > 1:
+        if args.output == '-':
+            parser.error("--split needs an output path")
+        for path in write_split_health_logs(args.output, args.split, **options):
+            print(path, file=sys.stderr)
+    elif args.output == '-':
+        write_health_log(sys.stdout.buffer, **options)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.output, 'wb') as f:
+            rows = write_health_log(f, **options)
+        print(f"{rows} rows -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from ZMLB.backend.downsample import METHODS, downsample_series
+
+
+# mood_score_scaled is NaN for every mood the chart doesn't map, often for
+# whole stretches of a log
+def nan_heavy(n=2000):
+    y = np.full(n, np.nan)
+    y[::97] = np.arange(len(y[::97])) * 1000.0
+    y[1500:] = np.nan
+    return y
+
+
+@pytest.mark.parametrize('method', sorted(METHODS))
+@pytest.mark.parametrize('column', [nan_heavy(), np.full(2000, np.nan)])
+def test_nan_columns(method, column):
+    idx = METHODS[method](column, 100)
+    assert idx[0] == 0 and idx[-1] == len(column) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert len(idx) <= 100
+
+
+@pytest.mark.parametrize('method', sorted(METHODS))
+def test_keeps_rows_aligned(method):
+    n = 2000
+    series = {'date': np.arange(n), 'steps': np.sin(np.arange(n) / 50.0), 'mood_score_scaled': nan_heavy(n)}
+    out = downsample_series(series, ['steps', 'mood_score_scaled'], threshold=100, method=method)
+    np.testing.assert_array_equal(np.sin(out['date'] / 50.0), out['steps'])
+    assert len(out['date']) <= 200
@@ -0,0 +1,79 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from ZMLB.backend.merge import merge_health_logs
+from ZMLB.backend.schema import read_health_log
+
+COLUMNS = ['date', 'sleep_hours', 'steps', 'hydration_ml', 'mood']
+
+
+# overlapping exports: each part covers a stretch of days, some days appear in
+# several parts and a few twice in the same part
+def parts(seed, count=3, rows=40):
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(count):
+        days = np.sort(rng.integers(i * 20, i * 20 + rows, rows))
+        out.append(pd.DataFrame({
+            'date': (pd.Timestamp('2025-01-01') + pd.to_timedelta(days, 'D')).strftime('%Y-%m-%d'),
+            'sleep_hours': rng.uniform(4, 9, rows).round(1),
+            'steps': rng.integers(2000, 12000, rows),
+            'hydration_ml': rng.integers(1500, 3000, rows),
+            'mood': rng.choice(['happy', 'sad', 'tired'], rows),
+        }))
+    return out
+
+
+def csv(df):
+    return io.BytesIO(df.to_csv(index=False).encode())
+
+
+# the slow way: everything in one frame, stable sort, one row per day
+def expected(frames, duplicates):
+    df = pd.concat([read_health_log(csv(f)) for f in frames], ignore_index=True)
+    df = df.sort_values('date', kind='stable')
+    if duplicates in ('last', 'first'):
+        return df.drop_duplicates('date', keep=duplicates)
+    return df.groupby('date', sort=True, observed=True).agg(
+        {'sleep_hours': 'mean', 'steps': 'mean', 'hydration_ml': 'mean', 'mood': 'last'}).reset_index()
+
+
+def assert_same_log(got, want):
+    got = got.reset_index(drop=True)[COLUMNS].astype({'mood': str})
+    want = want.reset_index(drop=True)[COLUMNS].astype({'mood': str})
+    pd.testing.assert_frame_equal(got, want, check_dtype=False, rtol=1e-5)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('chunk_rows', [1, 3, 16, 1000])
+@pytest.mark.parametrize('duplicates', ['last', 'first', 'mean'])
+def test_merge_matches_concat_sort_dedupe(seed, chunk_rows, duplicates):
+    frames = parts(seed)
+    got = merge_health_logs([csv(f) for f in frames], chunk_rows, duplicates)
+    assert got['date'].is_monotonic_increasing
+    assert not got['date'].duplicated().any()
+    assert_same_log(got, expected(frames, duplicates))
+
+
+# a part that goes back in time across chunks still comes out in order with
+# one row per day; which copy of a repeated day wins then depends on when its
+# rows went out (see merge.py), so only single days are compared by value
+def test_part_out_of_order():
+    frames = parts(7)
+    frames[1] = frames[1].iloc[::-1]
+    got = merge_health_logs([csv(f) for f in frames], chunk_rows=4)
+    want = expected(frames, 'last')
+    assert got['date'].is_monotonic_increasing
+    assert list(got['date']) == list(want['date'])
+
+    counts = pd.concat(frames)['date'].value_counts()
+    single = pd.to_datetime(counts.index[counts == 1])
+    assert_same_log(got[got['date'].isin(single)], want[want['date'].isin(single)])
+
+
+def test_undated_rows_dropped():
+    frame = parts(1, count=1)[0]
+    frame.loc[3, 'date'] = ''
+    got = merge_health_logs([csv(frame)], chunk_rows=5)
+    assert len(got) == len(frame.drop(index=3).drop_duplicates('date'))
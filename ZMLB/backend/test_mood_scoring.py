@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ZMLB.backend.hybrid_insight_engine import FEATURES, train_mood_model
+from ZMLB.backend.model_registry import OnlineMoodModel
+from ZMLB.backend.mood_scoring import MoodScorer, StackedMoodScorer, export_mood_model
+
+# the unscaled fits don't always converge; predict parity doesn't care
+pytestmark = pytest.mark.filterwarnings('ignore::sklearn.exceptions.ConvergenceWarning')
+
+
+def health_log(seed, moods, rows=200):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'sleep_hours': rng.uniform(4, 9, rows).round(1),
+        'hydration_ml': rng.integers(1500, 3000, rows).astype(float),
+        'steps': rng.integers(2000, 12000, rows).astype(float),
+        'mood': rng.choice(moods, rows),
+    })
+
+
+# rows far enough from a tie between the two best classes that the order of
+# the float ops can't decide them
+def clear_rows(scores):
+    top = np.sort(scores, axis=1)
+    return top[:, -1] - top[:, -2] > 1e-9
+
+
+@pytest.mark.parametrize('moods', [['happy', 'sad'], ['happy', 'sad', 'tired'], ['okay', 'sad', 'tired', 'angry']])
+def test_scorer_matches_sklearn_predict(moods):
+    df = health_log(len(moods), moods)
+    model, le = train_mood_model(df)
+    rows = health_log(99, moods)[FEATURES]
+    X = rows.to_numpy()
+    scorer = export_mood_model(model, le)
+    want = le.inverse_transform(model.predict(rows))
+    np.testing.assert_array_equal(scorer.predict_labels(X), want)
+    np.testing.assert_array_equal(MoodScorer.from_dict(scorer.to_dict()).predict_labels(X), want)
+
+
+# the registry's model scales its inputs; the scorer has the scaler folded in
+def test_scorer_matches_online_model():
+    model = OnlineMoodModel()
+    model.partial_fit(health_log(0, ['happy', 'sad', 'tired', 'okay']))
+    X = health_log(1, ['happy'])[FEATURES].to_numpy()
+    clear = clear_rows(model.model.decision_function(model.scaler.transform(X)))
+    assert clear.mean() > 0.9
+    got = export_mood_model(model, model.le).predict_labels(X)
+    np.testing.assert_array_equal(got[clear], model.le.inverse_transform(model.predict(X))[clear])
+
+
+# a classifier needs two moods to fit; a one-day or all-'okay' log gets no model
+def test_single_mood_not_fitted():
+    assert train_mood_model(health_log(0, ['okay'])) == (None, None)
+    assert train_mood_model(health_log(0, ['happy', 'sad'], rows=1)) == (None, None)
+
+
+# users with different moods learned (binary and multiclass) scored in one
+# batch, each row against its own user's model
+def test_stacked_matches_each_scorer():
+    user_moods = [['happy', 'sad'], ['happy', 'sad', 'tired'], ['okay', 'tired', 'angry', 'excited']]
+    scorers = []
+    for seed, moods in enumerate(user_moods):
+        model, le = train_mood_model(health_log(seed, moods))
+        scorers.append(export_mood_model(model, le))
+    stacked = StackedMoodScorer(scorers)
+
+    rng = np.random.default_rng(5)
+    X = health_log(6, ['happy'], rows=300)[FEATURES].to_numpy()
+    users = rng.integers(0, len(scorers), len(X))
+    want = np.empty(len(X), dtype=object)
+    for u, scorer in enumerate(scorers):
+        want[users == u] = scorer.predict_labels(X[users == u])
+    np.testing.assert_array_equal(stacked.predict_labels(X, users), want.astype(str))
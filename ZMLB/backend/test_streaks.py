@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ZMLB.backend.rules import DEFAULT_RULES, RuleAccumulator, compile_rules, segment_run_stats
+from ZMLB.backend.streaks import row_breaks, run_stats
+
+# every aggregation, so the streaming totals are checked against the whole-frame ones
+RULES = compile_rules(DEFAULT_RULES + [
+    {"name": "longest_low_sleep", "metric": "sleep_hours", "comparator": "<", "threshold": 7,
+     "aggregation": "longest_streak", "tiers": [(None, None, "{value}")]},
+    {"name": "active_days", "metric": "steps", "comparator": ">=", "threshold": 9000,
+     "aggregation": "count", "tiers": [(None, None, "{value}")]},
+    {"name": "min_water", "metric": "hydration_ml", "aggregation": "min", "tiers": [(None, None, "{value}")]},
+    {"name": "max_steps", "metric": "steps", "aggregation": "max", "tiers": [(None, None, "{value}")]},
+    {"name": "last_sleep", "metric": "sleep_hours", "aggregation": "last", "tiers": [(None, None, "{value}")]},
+    {"name": "recent_low_water", "metric": "hydration_ml", "comparator": "<", "threshold": 2200,
+     "aggregation": "count", "window_days": 14, "tiers": [(None, None, "{value}")]},
+    {"name": "recent_low_sleep", "metric": "sleep_hours", "comparator": "<", "threshold": 7,
+     "aggregation": "longest_streak", "window_days": 5, "tiers": [(None, None, "{value}")]},
+    {"name": "recent_steps", "metric": "steps", "aggregation": "mean", "window_days": 7,
+     "tiers": [(None, None, "{value}")]},
+])
+
+
+def health_log(seed, rows=60):
+    rng = np.random.default_rng(seed)
+    # gaps and repeated days, so runs break and continue across chunks
+    days = np.sort(rng.choice(rows, rows, replace=True))
+    df = pd.DataFrame({
+        'date': pd.Timestamp('2025-01-01') + pd.to_timedelta(days, 'D'),
+        'sleep_hours': rng.uniform(4, 9, rows).round(1),
+        'steps': rng.integers(2000, 12000, rows).astype(float),
+        'hydration_ml': rng.integers(1500, 3000, rows).astype(float),
+    })
+    df.loc[rng.integers(0, rows, 3), 'sleep_hours'] = np.nan
+    return df
+
+
+def streamed(df, chunk_rows):
+    acc = RuleAccumulator(RULES)
+    for start in range(0, len(df), chunk_rows):
+        acc.update(df.iloc[start:start + chunk_rows])
+    return acc.values()
+
+
+def assert_same(got, want):
+    assert got.keys() == want.keys()
+    for name in want:
+        assert got[name] == pytest.approx(want[name]), name
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('chunk_rows', [1, 2, 7, 1000])
+def test_chunked_matches_whole_frame(seed, chunk_rows):
+    df = health_log(seed)
+    assert_same(streamed(df, chunk_rows), RULES.values(df))
+
+
+# each chunk is put in date order, so disorder inside a chunk doesn't count
+def test_unordered_chunk():
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2025-01-10', '2025-01-01', '2025-01-02', '2025-01-03']),
+        'sleep_hours': [8.0] * 4,
+        'steps': [9000.0] * 4,
+        'hydration_ml': [1000.0] * 4,
+    })
+    values = streamed(df, 100)
+    assert values['hydration'] == RULES.values(df)['hydration'] == 1
+
+
+# undated rows sit last in a loaded log but aren't the latest day
+@pytest.mark.parametrize('chunk_rows', [1, 3])
+def test_undated_rows_left_out(chunk_rows):
+    df = pd.DataFrame({
+        'date': pd.to_datetime(['2025-01-01', '2025-01-02', None]),
+        'sleep_hours': [5.0, 8.0, 5.0],
+        'steps': [9000.0, 9000.0, 0.0],
+        'hydration_ml': [1000.0, 1000.0, 1000.0],
+    })
+    want = RULES.values(df)
+    assert want['hydration'] == 2
+    assert want['sleep'] == 0
+    assert want['steps'] == 9000
+    assert_same(streamed(df, chunk_rows), want)
+
+
+def test_segment_run_stats_per_user():
+    rng = np.random.default_rng(0)
+    sizes = [1, 5, 12, 3, 20]
+    starts = np.cumsum([0] + sizes[:-1])
+    ends = starts + np.array(sizes) - 1
+    masks = rng.random((sum(sizes), 3)) < 0.6
+    breaks = rng.random(sum(sizes)) < 0.1
+    breaks[starts] = True
+
+    current, longest, count = segment_run_stats(masks, breaks, starts, ends)
+    for u, (start, end) in enumerate(zip(starts, ends)):
+        _, want_current, want_longest, want_count = run_stats(masks[start:end + 1], breaks[start:end + 1])
+        np.testing.assert_array_equal(current[u], want_current)
+        np.testing.assert_array_equal(longest[u], want_longest)
+        np.testing.assert_array_equal(count[u], want_count)
+
+
+def test_values_by_user_matches_each_user():
+    frames = [health_log(seed, rows).assign(user_id=f'user_{seed}') for seed, rows in ((1, 1), (2, 30), (3, 45))]
+    # users interleaved by date; a user's rows for the same day keep their order
+    df = pd.concat(frames, ignore_index=True).sort_values('date', kind='stable')
+    by_user = RULES.values_by_user(df, 'user_id')
+    for frame in frames:
+        want = RULES.values(frame)
+        got = by_user.loc[frame['user_id'].iloc[0]].to_dict()
+        # the frame holds NaN where values() says None
+        assert_same({name: None if pd.isna(got[name]) else got[name] for name in want}, want)
+
+
+def test_backward_step_breaks_run():
+    dates = pd.Series(pd.to_datetime(['2025-01-02', '2025-01-03', '2025-01-01', '2025-01-02']))
+    np.testing.assert_array_equal(row_breaks(4, dates), [True, False, True, False])
+
+
+# a windowed rule only sees the trailing days: a run that started before the
+# window is cut at its first day, and days before it aren't counted
+def test_window_days():
+    dates = pd.date_range('2025-01-01', periods=10, freq='D')
+    df = pd.DataFrame({'date': dates, 'hydration_ml': [1000.0] * 8 + [3000.0, 1000.0]})
+    rules = compile_rules([
+        {"name": name, "metric": "hydration_ml", "comparator": "<", "threshold": 2200,
+         "aggregation": aggregation, "window_days": 3, "tiers": [(None, None, "{value}")]}
+        for name, aggregation in (("count", "count"), ("longest", "longest_streak"), ("current", "current_streak"))
+    ] + [{"name": "mean", "metric": "hydration_ml", "aggregation": "mean", "window_days": 3,
+          "tiers": [(None, None, "{value}")]}])
+    want = {"count": 2, "longest": 1, "current": 1, "mean": 5000 / 3}
+    assert_same(rules.values(df), want)
+    # the window follows the latest date, not the row count
+    assert_same(rules.values(df.drop(index=7)), {"count": 1, "longest": 1, "current": 1, "mean": 2000.0})
+    acc = RuleAccumulator(rules)
+    for start in range(0, len(df), 4):
+        acc.update(df.iloc[start:start + 4])
+    assert_same(acc.values(), want)
@@ -1,63 +1,167 @@
+import threading
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import LabelEncoder
+import matplotlib.style
+from io import BytesIO
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import warnings
+from ZMLB.backend.hybrid_insight_engine import HealthAnalysis
+from ZMLB.backend.downsample import downsample_series
+from ZMLB.backend.schema import read_health_log
+from ZMLB.backend.metrics import stage
 
 warnings.filterwarnings('ignore')
-plt.style.use('ggplot')
 
+# the ggplot style is applied on the first plot instead of at import, so
+# importing this module stays cheap; rcParams are only read after that
+STYLE = 'ggplot'
+_style_lock = threading.Lock()
+_style_applied = False
 
-def load_health_logs(filepath):
-    df = pd.read_csv(filepath, parse_dates=['date'])
-    df.sort_values('date', inplace=True)
-    return df
 
+def use_style():
+    global _style_applied
+    if _style_applied:
+        return
+    with _style_lock:
+        if not _style_applied:
+            matplotlib.style.use(STYLE)
+            _style_applied = True
 
-def train_mood_model(df):
-    if 'mood' not in df.columns:
-        raise ValueError("Missing 'mood' column for training.")
 
-    le = LabelEncoder()
-    df['mood_encoded'] = le.fit_transform(df['mood'])
+def load_health_logs(filepath):
+    # already in date order with a date index (see schema.date_indexed)
+    return read_health_log(filepath)
 
-    X = df[['sleep_hours', 'hydration_ml', 'steps']]
-    y = df['mood_encoded']
 
-    model = LogisticRegression()
-    model.fit(X, y)
-    return model, le
+MAX_MOOD_LABELS = 60
+SERIES_COLUMNS = ['date', 'sleep_hours', 'hydration_ml', 'steps', 'mood_score_scaled', 'predicted_mood']
+PLOTTED_COLUMNS = ['sleep_hours', 'hydration_ml', 'steps', 'mood_score_scaled']
 
 
-def plot_health_trends(df):
-    model, le = train_mood_model(df)
-    df['predicted_mood'] = le.inverse_transform(model.predict(df[['sleep_hours', 'hydration_ml', 'steps']]))
+# pass the HealthAnalysis from generate_combined_insights to skip retraining
+def plot_health_trends(df, analysis=None):
+    return plot_series(trend_series(df, analysis))
 
-    mood_map = {'sad': 0, 'neutral': 1, 'happy': 2}
-    df['mood_score'] = df['predicted_mood'].map(mood_map)
 
-    df['mood_score_scaled'] = df['mood_score'] * 1000
+# plain numpy arrays of everything the chart draws, cheap to pickle over to
+# a render worker. long logs are downsampled to TREND_POINT_BUDGET points
+# per plotted line first
+def trend_series(df, analysis=None):
+    if analysis is None:
+        if 'mood' not in df.columns:
+            raise ValueError("Missing 'mood' column for training.")
+        analysis = HealthAnalysis(df)
+    with stage('series'):
+        return _trend_series(analysis)
 
-    plt.figure(figsize=(14, 8)) 
 
-    plt.plot(df['date'], df['sleep_hours'], label='sleep_hours', marker='o')
-    plt.plot(df['date'], df['hydration_ml'], label='hydration_ml', marker='s')
-    plt.plot(df['date'], df['steps'], label='steps', marker='^')
+def _trend_series(analysis):
+    df = analysis.df
 
-    plt.plot(df['date'], df['mood_score_scaled'], label='predicted_mood (scaled)', color='purple', linestyle='--', marker='x')
+    mood_map = {'sad': 0, 'neutral': 1, 'happy': 2}
+    df['mood_score'] = df['predicted_mood'].map(mood_map)
 
-    for i, row in df.iterrows():
-        plt.text(row['date'], row['mood_score_scaled'] + 150, row['predicted_mood'], fontsize=9, color='purple', ha='center')
+    df['mood_score_scaled'] = df['mood_score'] * 1000
 
-    plt.title(" Health Trends with Predicted Mood")
-    plt.xlabel("Date")
-    plt.ylabel("Values")
-    plt.legend(loc='upper right')
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    return plt.gcf()  
+    series = {col: df[col].to_numpy() for col in SERIES_COLUMNS}
+    return downsample_series(series, PLOTTED_COLUMNS)
+
+
+# compact json form of the same series for clients that chart it themselves:
+# one shared date axis, metrics as number arrays and mood as integer codes
+# into mood_labels (null where a row had no prediction)
+def series_to_json(series):
+    dates = series['date']
+    if np.issubdtype(np.asarray(dates).dtype, np.datetime64):
+        dates = np.datetime_as_string(np.asarray(dates, dtype='datetime64[s]'), unit='auto')
+    moods = np.asarray(series['predicted_mood'], dtype=object)
+    predicted = ~pd.isna(moods)
+    mood_labels, codes = np.unique(moods[predicted].astype(str), return_inverse=True)
+    mood_codes = np.full(len(moods), None, dtype=object)
+    mood_codes[predicted] = codes.tolist()
+    return {
+        "dates": [str(d) for d in dates],
+        "sleep_hours": _json_numbers(series['sleep_hours']),
+        "hydration_ml": _json_numbers(series['hydration_ml']),
+        "steps": _json_numbers(series['steps']),
+        "mood_codes": mood_codes.tolist(),
+        "mood_labels": mood_labels.tolist(),
+    }
+
+
+def _json_numbers(values):
+    values = np.asarray(values, dtype=float)
+    return [None if np.isnan(v) else round(v, 2) for v in values.tolist()]
+
+
+def plot_series(series):
+    # explicit Figure/Axes instead of pyplot: the figure is never registered
+    # with pyplot's global manager, so concurrent requests can't draw into
+    # each other's plot and nothing is kept alive after the response
+    use_style()
+    fig = Figure(figsize=(14, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    ax.plot(series['date'], series['sleep_hours'], label='sleep_hours', marker='o')
+    ax.plot(series['date'], series['hydration_ml'], label='hydration_ml', marker='s')
+    ax.plot(series['date'], series['steps'], label='steps', marker='^')
+
+    ax.plot(series['date'], series['mood_score_scaled'], label='predicted_mood (scaled)', color='purple', linestyle='--', marker='x')
+
+    dates = series['date']
+    scores = series['mood_score_scaled']
+    moods = series['predicted_mood']
+    for i in mood_label_points(moods, scores):
+        ax.text(dates[i], scores[i] + 150, moods[i], fontsize=9, color='purple', ha='center')
+
+    ax.set_title(" Health Trends with Predicted Mood")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Values")
+    ax.legend(loc='upper right')
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+    return fig
+
+
+# which points get a mood label: every point for short logs, otherwise only
+# where the mood changes, thinned evenly so the artist count never goes past
+# max_labels no matter how long the history is
+def mood_label_points(moods, scores=None, max_labels=MAX_MOOD_LABELS):
+    moods = np.asarray(moods)
+    n = len(moods)
+    if n == 0:
+        return np.array([], dtype=int)
+    if n <= max_labels:
+        idx = np.arange(n)
+    else:
+        idx = np.flatnonzero(np.r_[True, moods[1:] != moods[:-1]])
+    if scores is not None:
+        idx = idx[~pd.isna(np.asarray(scores)[idx])]
+    if len(idx) > max_labels:
+        idx = idx[np.unique(np.linspace(0, len(idx) - 1, max_labels).astype(int))]
+    return idx
+
+
+# rasterize and free the figure's artists right away instead of waiting for gc
+def figure_to_png(fig, dpi=200):
+    buf = BytesIO()
+    try:
+        fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+def render_series_png(series, dpi=200):
+    with stage('render'):
+        fig = plot_series(series)
+    with stage('savefig'):
+        return figure_to_png(fig, dpi)
 
 
 
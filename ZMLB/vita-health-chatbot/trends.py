@@ -112,11 +112,14 @@
 
 #     return fig 
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
 plt.style.use('ggplot')
 
+MAX_MOOD_LABELS = 60
+
 # Load and preprocess CSV
 def load_health_logs(filepath):
     df = pd.read_csv(filepath, parse_dates=['date'])
@@ -127,6 +130,23 @@ def load_health_logs(filepath):
     
     return df
 
+# Label every point for short logs, otherwise only mood changes, thinned so
+# the number of text artists stays under max_labels
+def mood_label_points(moods, scores=None, max_labels=MAX_MOOD_LABELS):
+    moods = np.asarray(moods)
+    n = len(moods)
+    if n == 0:
+        return np.array([], dtype=int)
+    if n <= max_labels:
+        idx = np.arange(n)
+    else:
+        idx = np.flatnonzero(np.r_[True, moods[1:] != moods[:-1]])
+    if scores is not None:
+        idx = idx[~pd.isna(np.asarray(scores)[idx])]
+    if len(idx) > max_labels:
+        idx = idx[np.unique(np.linspace(0, len(idx) - 1, max_labels).astype(int))]
+    return idx
+
 # Plot health trends in a 2x2 grid
 def plot_health_trends(df):
     mood_map = {'sad': 0, 'neutral': 1, 'happy': 2}
@@ -152,9 +172,12 @@ def plot_health_trends(df):
     plt.ylabel('Mood Score')
     plt.xticks(rotation=45)
 
-    # Annotate mood text
-    for i, row in df.iterrows():
-        plt.annotate(row['mood'], (row['date'], row['mood_score'] + 0.1), fontsize=8, color='darkorange', ha='center')
+    # Annotate mood text (capped, see mood_label_points)
+    moods = df['mood'].to_numpy()
+    dates_arr = dates.to_numpy()
+    scores = df['mood_score'].to_numpy()
+    for i in mood_label_points(moods, scores):
+        plt.annotate(moods[i], (dates_arr[i], scores[i] + 0.1), fontsize=8, color='darkorange', ha='center')
 
     # 3. Hydration
     plt.subplot(2, 2, 3)
@@ -0,0 +1,75 @@
+'use client';
+
+export type TrendSeries = {
+  dates: string[];
+  sleep_hours: (number | null)[];
+  hydration_ml: (number | null)[];
+  steps: (number | null)[];
+  mood_codes: (number | null)[];
+  mood_labels: string[];
+};
+
+const WIDTH = 600;
+const HEIGHT = 120;
+const PAD = 8;
+
+function linePath(values: (number | null)[]) {
+  const nums = values.filter((v): v is number => v !== null);
+  if (nums.length === 0) return '';
+  const min = Math.min(...nums);
+  const max = Math.max(...nums);
+  const span = max - min || 1;
+  const step = values.length > 1 ? (WIDTH - 2 * PAD) / (values.length - 1) : 0;
+
+  let d = '';
+  let penDown = false;
+  values.forEach((v, i) => {
+    if (v === null) {
+      penDown = false;
+      return;
+    }
+    const x = PAD + i * step;
+    const y = HEIGHT - PAD - ((v - min) / span) * (HEIGHT - 2 * PAD);
+    d += `${penDown ? 'L' : 'M'}${x.toFixed(1)} ${y.toFixed(1)}`;
+    penDown = true;
+  });
+  return d;
+}
+
+function Panel({ title, values, color }: { title: string; values: (number | null)[]; color: string }) {
+  const nums = values.filter((v): v is number => v !== null);
+  const min = nums.length ? Math.min(...nums) : 0;
+  const max = nums.length ? Math.max(...nums) : 0;
+
+  return (
+    <div className="w-full">
+      <div className="flex justify-between text-xs text-gray-600">
+        <span className="font-semibold">{title}</span>
+        <span>{min} – {max}</span>
+      </div>
+      <svg className="w-full h-auto bg-white rounded" viewBox={`0 0 ${WIDTH} ${HEIGHT}`}>
+        <path d={linePath(values)} fill="none" stroke={color} strokeWidth={1.5} />
+      </svg>
+    </div>
+  );
+}
+
+// draws the /upload-csv/?format=series payload in the browser instead of
+// shipping a server-rendered png
+export default function TrendChart({ trend }: { trend: TrendSeries }) {
+  const first = trend.dates[0];
+  const last = trend.dates[trend.dates.length - 1];
+
+  return (
+    <div className="w-full space-y-3">
+      <Panel title="sleep_hours" values={trend.sleep_hours} color="#4f46e5" />
+      <Panel title="hydration_ml" values={trend.hydration_ml} color="#2563eb" />
+      <Panel title="steps" values={trend.steps} color="#16a34a" />
+      <Panel title={`predicted_mood (${trend.mood_labels.join(', ')})`} values={trend.mood_codes} color="purple" />
+      <div className="flex justify-between text-xs text-gray-500">
+        <span>{first}</span>
+        <span>{last}</span>
+      </div>
+    </div>
+  );
+}
@@ -4,6 +4,7 @@
 import { motion } from 'framer-motion';
 import React, { useEffect, useState } from 'react';
 import BackgroundPaths from '../components/BackgroundPaths';
+import TrendChart, { TrendSeries } from '../components/TrendChart';
 
 const emojis = [
   '🧠', '💬', '📊', '😴', '💧', '😊', '📈', '🧪',
@@ -17,6 +18,7 @@ export default function InsightsPage() {
   const [shuffledEmojis, setShuffledEmojis] = useState(emojis);
   const [insight, setInsight] = useState('');
   const [trendImage, setTrendImage] = useState('');
+  const [trend, setTrend] = useState<TrendSeries | null>(null);
   const [chatOpen, setChatOpen] = useState(false);
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [loading, setLoading] = useState(false);
@@ -24,8 +26,8 @@ export default function InsightsPage() {
   const isDev = process.env.NODE_ENV === 'development';
 
   const BACKEND_URL = isDev
-    ? 'http://localhost:10000/upload-csv/'
-    : 'https://healthinsightgenerator.onrender.com/upload-csv/';
+    ? 'http://localhost:10000/upload-csv/?format=series'
+    : 'https://healthinsightgenerator.onrender.com/upload-csv/?format=series';
   
   const CHATBOT_URL = isDev
     ? 'http://localhost:8501/'
@@ -56,6 +58,7 @@ export default function InsightsPage() {
     setLoading(true);
     setInsight('');
     setTrendImage('');
+    setTrend(null);
 
     try {
       const res = await fetch(BACKEND_URL, {
@@ -73,7 +76,11 @@ export default function InsightsPage() {
       console.log('Received response:', data);
 
       setInsight(JSON.stringify(data.insights, null, 2));
-      setTrendImage(`data:image/png;base64,${data.trend_image}`);
+      if (data.trend) {
+        setTrend(data.trend);
+      } else if (data.trend_image) {
+        setTrendImage(`data:image/png;base64,${data.trend_image}`);
+      }
     } catch (err) {
       console.error('❌ Error uploading file:', err);
       setInsight("❌ Failed to generate insights.");
@@ -150,6 +157,13 @@ export default function InsightsPage() {
               </div>
             )}
 
+            {trend && (
+              <div className="w-full mt-6">
+                <h3 className="font-bold mb-2">📊 Trends</h3>
+                <TrendChart trend={trend} />
+              </div>
+            )}
+
             {trendImage && (
               <div className="w-full mt-6">
                 <h3 className="font-bold mb-2">📊 Trends</h3>